@@ -2,18 +2,31 @@
 
 import os
 import json
-import torch
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, Response, g, request, jsonify, send_from_directory
 from flask_cors import CORS
 from dotenv import load_dotenv
 from werkzeug.utils import secure_filename
-import whisperx
-import yt_dlp
 import uuid
 import re
 import logging
-import subprocess
 import openai
+import functools
+import time
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from contextlib import ExitStack
+from jobs import Job, JobManager, QueueFullError
+from ratelimit import TokenBucket, retry_with_backoff
+from cache import ResultCache, make_key, hash_file
+from llm_cache import LLMResponseCache, SQLiteResponseStore, make_llm_key
+from audio import SAMPLE_RATE, decode_audio, drop_silent_windows, silence_windows, shard_bounds
+from sharding import ShardedTranscriber, offset_segments
+from retrieval import TranscriptIndex, tokenize
+from chunking import StreamingChunker, chunk_segments, target_chunk_tokens
+from batching import BatchScheduler, whisperx_batch_runner
+from metrics import Registry, timed
+from intents import INTENT_EXAMPLES, IntentRouter, NaiveBayesIntentClassifier
+from youtube import YouTubeDownloadCache
+from models import LoadedModel, ModelRegistry, parse_mapping
 
 # --- Configuration & Setup ---
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -32,21 +45,118 @@ app.debug = True
 CORS(app)
 
 try:
-    openai_client = openai.OpenAI(api_key=openai_api_key)
+    # Retries are handled in call_openai_api so every attempt goes through the rate limiter.
+    openai_client = openai.OpenAI(api_key=openai_api_key, base_url=os.getenv("OPENAI_BASE_URL") or None, max_retries=0)
     app_logger.info("OpenAI API Client initialized.")
 except Exception as e:
     app_logger.error(f"Error initializing OpenAI API Client: {e}")
     exit(1)
 
-transcription_model = None
-try:
+openai_rate_limiter = TokenBucket(float(os.getenv("OPENAI_RPM", "500")) / 60, float(os.getenv("OPENAI_BURST", "10")))
+OPENAI_MAX_ATTEMPTS = int(os.getenv("OPENAI_MAX_ATTEMPTS", "5"))
+LLM_CACHE_MAX_TEMPERATURE = float(os.getenv("LLM_CACHE_MAX_TEMPERATURE", "0.3"))
+llm_cache = None
+if os.getenv("LLM_CACHE", "on") != "off":
+    llm_cache_db = os.getenv("LLM_CACHE_DB")
+    disk_store = SQLiteResponseStore(llm_cache_db, float(os.getenv("LLM_CACHE_TTL_SECONDS", "604800"))) if llm_cache_db else None
+    llm_cache = LLMResponseCache(int(os.getenv("LLM_CACHE_ENTRIES", "2048")), disk_store)
+documentation_executor = ThreadPoolExecutor(max_workers=int(os.getenv("DOC_CONCURRENCY", "8")), thread_name_prefix="doc")
+job_manager = JobManager(max_workers=int(os.getenv("JOB_WORKERS", "2")), max_pending=int(os.getenv("JOB_QUEUE_LIMIT", "32")))
+result_cache = ResultCache(os.getenv("CACHE_DIR", "cache"), int(float(os.getenv("CACHE_MAX_MB", "2048")) * 1024 * 1024))
+youtube_cache = YouTubeDownloadCache(
+    os.getenv("YOUTUBE_CACHE_DIR", "youtube_cache"), int(float(os.getenv("YOUTUBE_CACHE_MAX_MB", "4096")) * 1024 * 1024),
+    audio_only=os.getenv("YOUTUBE_AUDIO_ONLY", "on") != "off", concurrent_fragments=int(os.getenv("YOUTUBE_FRAGMENTS", "4"))
+)
+intent_router = None
+if os.getenv("INTENT_ROUTER", "on") != "off":
+    intent_classifier = NaiveBayesIntentClassifier.load_or_train(os.getenv("INTENT_MODEL_PATH", "intent_model.json"), INTENT_EXAMPLES)
+    intent_router = IntentRouter(intent_classifier, float(os.getenv("INTENT_CONFIDENCE_THRESHOLD", "0.8")))
+
+WHISPER_MODELS = [m.strip() for m in os.getenv("WHISPER_MODELS", "base").split(",") if m.strip()]  # kept warm, first is the default
+WHISPER_COMPUTE_TYPE = os.getenv("WHISPER_COMPUTE_TYPE") or None  # default: float16 on GPU, int8 on CPU
+WHISPER_MODEL_BY_LANGUAGE = parse_mapping(os.getenv("WHISPER_MODEL_BY_LANGUAGE", ""))
+WHISPER_LONG_AUDIO_MODEL = os.getenv("WHISPER_LONG_AUDIO_MODEL") or None
+WHISPER_LONG_AUDIO_SECONDS = float(os.getenv("WHISPER_LONG_AUDIO_SECONDS", "1800"))
+CHUNK_SETTINGS = {
+    "min_tokens": int(os.getenv("CHUNK_MIN_TOKENS", "400")), "max_tokens": int(os.getenv("CHUNK_MAX_TOKENS", "2000")),
+    "max_calls": int(os.getenv("CHUNK_MAX_CALLS", "40"))
+}
+CHUNK_TOKENS_PER_SECOND = float(os.getenv("CHUNK_TOKENS_PER_SECOND", "3"))  # typical speech rate, for sizing streamed chunks
+STREAM_TRANSCRIPTION = os.getenv("STREAM_TRANSCRIPTION", "off")
+STREAM_WINDOW_SECONDS = float(os.getenv("STREAM_WINDOW_SECONDS", "60"))
+AUDIO_MEMMAP_AFTER_SECONDS = float(os.getenv("AUDIO_MEMMAP_AFTER_SECONDS", "1800")) or None
+AUDIO_SCRATCH_DIR = os.getenv("AUDIO_SCRATCH_DIR") or None
+# Either setting turns sharding on: the worker pool size and the shard count default to each other.
+TRANSCRIBE_WORKERS = int(os.getenv("TRANSCRIBE_WORKERS", "0")) or int(os.getenv("TRANSCRIBE_SHARDS", "0"))
+TRANSCRIBE_SHARDS = int(os.getenv("TRANSCRIBE_SHARDS", "0")) or TRANSCRIBE_WORKERS
+SHARD_MIN_SECONDS = float(os.getenv("SHARD_MIN_SECONDS", "300"))
+BATCH_SCHEDULER = os.getenv("BATCH_SCHEDULER", "off")
+BATCH_SIZE = int(os.getenv("BATCH_SIZE", "16"))
+BATCH_MAX_WAIT_MS = float(os.getenv("BATCH_MAX_WAIT_MS", "50"))
+BATCH_WINDOW_SECONDS = 30.0  # Whisper's context length
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", "120"))
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", "4"))
+RETRIEVAL_EMBEDDING_MODEL = os.getenv("RETRIEVAL_EMBEDDING_MODEL") or None
+SECTION_SYSTEM_MESSAGE = "You are an expert technical writer. Respond with a JSON object with two keys: 'title', a concise, factual, documentation-style title (under 8 words, no emojis) for the transcript chunk, and 'summary', a clear, well-structured Markdown summary (headings, bullet points) of the chunk."
+SECTION_LLM_PARAMS = ("gpt-4o-mini", 900, 0.3)
+SECTION_ERROR_TITLE = "Error Generating Section"
+FAQ_MAP_SYSTEM_MESSAGE = "You are a JSON generation machine. Create a 'faqs' key containing a JSON array of {count} question/answer objects (keys 'question' and 'answer') that a viewer would likely ask about the provided excerpt of a video. Your response must be a valid JSON object."
+FAQ_REDUCE_SYSTEM_MESSAGE = "You are a JSON generation machine. You are given candidate question/answer objects collected from different parts of one video. Merge duplicates and keep the 3-5 most useful, returning a 'faqs' key containing a JSON array of question/answer objects (keys 'question' and 'answer'). Your response must be a valid JSON object."
+FAQ_LLM_PARAMS = ("gpt-4o-mini", 600, 0.2)
+FAQ_MAP_GROUP_SIZE = int(os.getenv("FAQ_MAP_GROUP_SIZE", "4"))
+FAQ_REDUCE_CANDIDATES, FAQ_MIN_COUNT, FAQ_COUNT = 20, 3, 5
+
+def load_transcription_model(name: str) -> LoadedModel:
+    # torch and whisperx are imported here, on the loader thread, so importing the app stays fast.
+    import torch
+    import whisperx
     device = "cuda" if torch.cuda.is_available() else "cpu"
+    compute_type = WHISPER_COMPUTE_TYPE or ("float16" if device == "cuda" else "int8")
     if device == "cpu": torch.set_num_threads(os.cpu_count())
-    app_logger.info(f"Loading WhisperX model on device: {device}...")
-    transcription_model = whisperx.load_model("base", device, compute_type="float32")
-    app_logger.info("Transcription model loaded globally.")
-except Exception as e:
-    app_logger.error(f"Could not load AI models globally: {e}")
+    app_logger.info(f"Loading WhisperX model {name} ({compute_type}) on device: {device}...")
+    model, batch_scheduler, sharded_transcriber = whisperx.load_model(name, device, compute_type=compute_type), None, None
+    # All jobs on a model share one batching scheduler when it is on; otherwise long CPU jobs may be sharded across processes.
+    if BATCH_SCHEDULER.lower() in ("1", "true", "on"):
+        batch_scheduler = BatchScheduler(whisperx_batch_runner(model), BATCH_SIZE, BATCH_MAX_WAIT_MS / 1000)
+    elif device == "cpu" and TRANSCRIBE_WORKERS > 1:
+        # Sharding is an optimisation: if the pool cannot start (it shuts itself down), the model still serves in-process.
+        try: sharded_transcriber = ShardedTranscriber(name, compute_type, TRANSCRIBE_WORKERS)
+        except Exception as e: app_logger.error(f"Could not start sharded transcription for {name}, transcribing in-process: {e}")
+    return LoadedModel(name, compute_type, device, model, batch_scheduler, sharded_transcriber)
+
+model_registry = ModelRegistry(
+    WHISPER_MODELS, load_transcription_model, by_language=WHISPER_MODEL_BY_LANGUAGE, long_audio_model=WHISPER_LONG_AUDIO_MODEL,
+    long_audio_seconds=WHISPER_LONG_AUDIO_SECONDS, retry_seconds=float(os.getenv("MODEL_LOAD_RETRY_SECONDS", "30"))
+)
+# Shard workers are spawned processes that import this file as __mp_main__; they load their own model.
+if __name__ != "__mp_main__": model_registry.start()
+
+# --- Metrics ---
+metrics_registry = Registry()
+STAGE_SECONDS = metrics_registry.histogram("viddocu_stage_seconds", "Wall time of each upload pipeline stage.", ("stage",))
+JOB_SECONDS = metrics_registry.histogram("viddocu_job_seconds", "End-to-end processing time of upload jobs.", ("status",))
+REQUEST_SECONDS = metrics_registry.histogram("viddocu_http_request_seconds", "Handler time per endpoint.", ("endpoint", "status"))
+LLM_SECONDS = metrics_registry.histogram("viddocu_llm_request_seconds", "call_openai_api latency including retries, by caller.", ("caller",))
+LLM_CALLS = metrics_registry.counter("viddocu_llm_calls_total", "call_openai_api calls by caller and result (ok, error, cache_hit).", ("caller", "result"))
+LLM_TOKENS = metrics_registry.counter("viddocu_llm_tokens_total", "Tokens billed by OpenAI, by caller and kind.", ("caller", "kind"))
+ERRORS = metrics_registry.counter("viddocu_errors_total", "Errors by pipeline stage or endpoint.", ("stage",))
+metrics_registry.callback("viddocu_llm_cache_total", "LLM response cache lookups by result.", "counter", "result", lambda: {k: v for k, v in llm_cache.stats().items() if k != "memory_entries"} if llm_cache else {})
+metrics_registry.callback("viddocu_result_cache_total", "Stage result cache lookups by result.", "counter", "result", lambda: {"hit": result_cache.hits, "miss": result_cache.misses})
+metrics_registry.callback("viddocu_jobs", "Upload jobs currently tracked, by status.", "gauge", "status", lambda: job_manager.stats())
+metrics_registry.callback("viddocu_youtube_cache_total", "YouTube download cache lookups by result.", "counter", "result", lambda: youtube_cache.stats())
+metrics_registry.callback("viddocu_intent_router_total", "/command intent router decisions by source (pattern, classifier, fallback).", "counter", "source", lambda: {k: v for k, v in intent_router.stats().items() if k != "hit_rate"} if intent_router else {})
+metrics_registry.callback("viddocu_batch_scheduler", "Transcription batch scheduler statistics, by model.", "gauge", ("model", "stat"), lambda: {(m.name, k): v for m in model_registry.loaded() if m.batch_scheduler for k, v in m.batch_scheduler.stats().items()})
+metrics_registry.callback("viddocu_model_ready", "Whether each configured transcription model is loaded (1) or not (0).", "gauge", "model", lambda: {n: int(m["status"] == "ready") for n, m in model_registry.status()["models"].items()})
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def observe_request_time(response):
+    started = g.get("request_started")
+    if started is not None and request.endpoint: REQUEST_SECONDS.observe(time.perf_counter() - started, endpoint=request.endpoint, status=response.status_code)
+    return response
 
 # --- Helper Functions ---
 def format_timestamp(seconds: float) -> str:
@@ -54,44 +164,155 @@ def format_timestamp(seconds: float) -> str:
     hours = int(seconds // 3600); minutes = int((seconds % 3600) // 60); secs = int(seconds % 60)
     return f"{hours:02}:{minutes:02}:{secs:02}"
 
-def call_openai_api(user_prompt: str, system_message: str, model_name: str, max_tokens: int, temperature: float, json_mode: bool = False) -> str:
+def is_retryable_openai_error(e: Exception) -> bool:
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError, openai.RateLimitError)): return True
+    return isinstance(e, openai.APIStatusError) and e.status_code >= 500
+
+def call_openai_api(user_prompt: str, system_message: str, model_name: str, max_tokens: int, temperature: float, json_mode: bool = False, caller: str = "other", parse=None):
+    messages = [{"role": "system", "content": system_message}, {"role": "user", "content": user_prompt}]
+    params = {"model": model_name, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+    if json_mode: params["response_format"] = {"type": "json_object"}
+    # Only near-deterministic calls are memoized; higher temperatures are expected to vary.
+    cache_key = make_llm_key(model_name, system_message, user_prompt, max_tokens, temperature, json_mode) if llm_cache and temperature <= LLM_CACHE_MAX_TEMPERATURE else None
+    if cache_key:
+        cached = llm_cache.get(cache_key)
+        if cached is not None:
+            LLM_CALLS.inc(caller=caller, result="cache_hit")
+            return parse(cached) if parse else cached
+    def attempt():
+        openai_rate_limiter.acquire()
+        return openai_client.chat.completions.create(**params)
     try:
-        messages = [{"role": "system", "content": system_message}, {"role": "user", "content": user_prompt}]
-        params = {"model": model_name, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
-        if json_mode: params["response_format"] = {"type": "json_object"}
-        response = openai_client.chat.completions.create(**params)
-        return response.choices[0].message.content
+        with timed(LLM_SECONDS, caller=caller):
+            response = retry_with_backoff(attempt, is_retryable_openai_error, max_attempts=OPENAI_MAX_ATTEMPTS)
     except Exception as e:
+        LLM_CALLS.inc(caller=caller, result="error"); ERRORS.inc(stage=f"llm_{caller}")
         raise RuntimeError(f"Failed to get response from OpenAI: {e}")
+    LLM_CALLS.inc(caller=caller, result="ok")
+    if response.usage:
+        LLM_TOKENS.inc(response.usage.prompt_tokens, caller=caller, kind="prompt"); LLM_TOKENS.inc(response.usage.completion_tokens, caller=caller, kind="completion")
+    content = response.choices[0].message.content
+    # parse (the caller's validation) runs first and raises on a malformed reply, so such replies are never cached.
+    result = parse(content) if parse else content
+    if cache_key and content is not None and response.choices[0].finish_reason == "stop": llm_cache.set(cache_key, content)
+    return result
+
+def parse_section(response_content: str) -> dict:
+    data = json.loads(response_content)
+    if not isinstance(data, dict) or not isinstance(data.get("title"), str) or not isinstance(data.get("summary"), str): raise RuntimeError("Malformed section response from OpenAI.")
+    return {"title": data["title"].strip(), "summary": data["summary"].strip()}
+
+def generate_section(text: str) -> dict:
+    return call_openai_api(text, SECTION_SYSTEM_MESSAGE, *SECTION_LLM_PARAMS, json_mode=True, caller="section", parse=parse_section)
+
+def document_chunk(chunk: dict) -> dict:
+    try:
+        return {**generate_section(chunk["text"]), "timestamp": chunk["timestamp"]}
+    except Exception as e:
+        return {"title": SECTION_ERROR_TITLE, "summary": str(e), "timestamp": chunk.get("timestamp", 0)}
+
+def submit_section(job: Job, chunk: dict, index: int) -> Future:
+    future = documentation_executor.submit(document_chunk, chunk)
+    future.add_done_callback(lambda f: job.publish("section", {"index": index, **f.result()}))
+    return future
 
-def summarize_text(text: str) -> str:
-    system_message = "You are an expert technical writer. Summarize the provided transcript chunk into a clear, well-structured format using Markdown (headings, bullet points)."
-    return call_openai_api(text, system_message, "gpt-4o-mini", 800, 0.3)
+def collect_sections(job: Job, futures: list) -> list:
+    pending = [f for f in futures if not f.done()]
+    job.set_stage("documenting", total=len(futures), done=len(futures) - len(pending))
+    for _ in as_completed(pending): job.advance()
+    return [f.result() for f in futures]
 
-def generate_title(text: str) -> str:
-    system_message = "Provide a concise, factual, documentation-style title (under 8 words) for this transcript chunk. No emojis."
-    return call_openai_api(text, system_message, "gpt-4o-mini", 30, 0.3)
+def parse_faqs(response_content: str) -> list:
+    data = json.loads(response_content)
+    faqs_list = data.get("faqs") if isinstance(data, dict) else None
+    if not isinstance(faqs_list, list): raise RuntimeError("Malformed FAQ response from OpenAI.")
+    return [{"question": str(f["question"]).strip(), "answer": str(f["answer"]).strip()} for f in faqs_list if isinstance(f, dict) and f.get("question") and f.get("answer")]
 
-def generate_faqs(full_transcript_text: str) -> list:
-    system_message = "You are a JSON generation machine. Create a 'faqs' key containing a JSON array of 3-5 question/answer objects based on the provided transcript. Your response must be a valid JSON object."
-    user_prompt = f"Create the FAQ JSON from this transcript:\n\n{full_transcript_text}"
+def extract_faq_candidates(text: str, count: str = "1-3") -> list:
     try:
-        response_content = call_openai_api(user_prompt, system_message, "gpt-4o-mini", 1000, 0.2, json_mode=True)
-        data = json.loads(response_content); faqs_list = data.get("faqs", [])
-        return faqs_list if isinstance(faqs_list, list) else []
-    except Exception: return []
-
-def chunk_segments(segments: list, max_words: int = 150) -> list:
-    chunks, current_chunk, word_count = [], [], 0; current_start = None
-    for seg in segments:
-        seg_words = len(seg.get("text", "").split())
-        if current_chunk and (word_count + seg_words > max_words):
-            chunks.append({"text": " ".join(s["text"].strip() for s in current_chunk), "timestamp": current_start})
-            current_chunk, word_count = [], 0
-        if not current_chunk: current_start = seg.get("start", 0)
-        current_chunk.append(seg); word_count += seg_words
-    if current_chunk: chunks.append({"text": " ".join(s["text"].strip() for s in current_chunk), "timestamp": current_start})
-    return chunks
+        return call_openai_api(f"Create the FAQ JSON from this excerpt:\n\n{text}", FAQ_MAP_SYSTEM_MESSAGE.format(count=count), *FAQ_LLM_PARAMS, json_mode=True, caller="faqs", parse=parse_faqs)
+    except Exception as e:
+        app_logger.warning(f"FAQ extraction failed for one excerpt: {e}")
+        return []
+
+def rank_faq_candidates(candidates: list, overlap: float = 0.8) -> list:
+    # Questions merge when shared content words cover most of the shorter one, so shared template wording
+    # ("what is said about ...") alone doesn't merge them; questions raised by more parts of the video rank first.
+    groups = []
+    for faq in candidates:
+        tokens = set(tokenize(faq["question"]))
+        for group in groups:
+            shorter = min(len(tokens), len(group["tokens"]))
+            if shorter and len(tokens & group["tokens"]) / shorter >= overlap:
+                group["support"] += 1
+                break
+        else:
+            groups.append({"faq": faq, "tokens": tokens, "support": 1})
+    return [g["faq"] for g in sorted(groups, key=lambda g: g["support"], reverse=True)]
+
+def top_up_faqs(faqs: list, candidates: list) -> list:
+    # Merging or a terse reduce reply can leave too few FAQs; fill up from the unmerged candidates, skipping repeats.
+    faqs, seen = list(faqs), {f["question"].lower() for f in faqs}
+    for faq in candidates:
+        if len(faqs) >= FAQ_MIN_COUNT: break
+        if faq["question"].lower() not in seen: faqs.append(faq); seen.add(faq["question"].lower())
+    return faqs
+
+def generate_faqs(texts: list, on_progress=None) -> list:
+    groups = ["\n\n".join(texts[i:i + FAQ_MAP_GROUP_SIZE]) for i in range(0, len(texts), FAQ_MAP_GROUP_SIZE)]
+    # A short video is a single excerpt, which then has to supply the full 3-5 FAQs on its own.
+    count = "1-3" if len(groups) > 1 else f"{FAQ_MIN_COUNT}-{FAQ_COUNT}"
+    def extract(text):
+        candidates = extract_faq_candidates(text, count)
+        if on_progress: on_progress()
+        return candidates
+    candidates = [faq for faqs in documentation_executor.map(extract, groups) for faq in faqs]
+    ranked = rank_faq_candidates(candidates); faqs = ranked[:FAQ_COUNT]
+    if len(ranked) > FAQ_COUNT:
+        try:
+            reduced = call_openai_api(json.dumps(ranked[:FAQ_REDUCE_CANDIDATES]), FAQ_REDUCE_SYSTEM_MESSAGE, *FAQ_LLM_PARAMS, json_mode=True, caller="faqs_reduce", parse=parse_faqs)
+            if reduced: faqs = reduced[:FAQ_COUNT]
+        except Exception as e:
+            app_logger.warning(f"FAQ reduce step failed, using ranked candidates: {e}")
+    return top_up_faqs(faqs, candidates)
+
+def transcription_windows(model: LoadedModel, audio, stream: bool) -> list:
+    if model.batch_scheduler: return drop_silent_windows(audio, silence_windows(audio, BATCH_WINDOW_SECONDS))
+    if stream: return silence_windows(audio, STREAM_WINDOW_SECONDS)
+    if model.sharded_transcriber and TRANSCRIBE_SHARDS > 1 and len(audio) >= SHARD_MIN_SECONDS * SAMPLE_RATE:
+        return shard_bounds(audio, TRANSCRIBE_SHARDS)
+    return [(0, len(audio))]
+
+def transcribe_audio(model: LoadedModel, audio, language: str, windows: list, on_segment=None, on_window=None) -> list:
+    if model.batch_scheduler:
+        # Every window is queued up front so the scheduler can batch it with windows from other jobs.
+        futures = [model.batch_scheduler.submit(audio[a:b], language) for a, b in windows]
+        results = ([{"text": text, "start": round(a / SAMPLE_RATE, 3), "end": round(b / SAMPLE_RATE, 3)}] if (text := f.result()) else [] for f, (a, b) in zip(futures, windows))
+    elif model.sharded_transcriber and len(windows) > 1:
+        results = model.sharded_transcriber.map(audio, language, windows)
+    else:
+        results = (offset_segments(model.model.transcribe(audio[a:b], language=language).get("segments", []), a / SAMPLE_RATE) for a, b in windows)
+    segments = []
+    for window_segments in results:
+        for seg in window_segments:
+            segments.append(seg)
+            if on_segment: on_segment(seg)
+        if on_window: on_window()
+    return segments
+
+@functools.lru_cache(maxsize=32)
+def load_transcript_index(index_id: str) -> TranscriptIndex:
+    data = result_cache.get("indexes", index_id)
+    if data is None: raise KeyError(index_id)
+    return TranscriptIndex.from_dict(data)
+
+def build_transcript_index(index_id: str, segments: list):
+    if result_cache.has("indexes", index_id): return
+    index = TranscriptIndex.build(chunk_segments(segments, target_tokens=RETRIEVAL_CHUNK_TOKENS), embedding_model=RETRIEVAL_EMBEDDING_MODEL)
+    result_cache.set("indexes", index_id, index.to_dict())
+
+def transcript_entry(seg: dict) -> dict:
+    return {"text": seg["text"].strip(), "start": seg.get("start", 0), "formatted_timestamp": format_timestamp(seg.get("start", 0))}
 
 def get_youtube_video_id(url: str) -> str | None:
     match = re.search(r'(?:youtu\.be\/|youtube\.com\/(?:watch\?v=|embed\/|v\/|shorts\/))([a-zA-Z0-9_-]{11})', url)
@@ -105,13 +326,23 @@ def serve_video(filename):
 @app.route("/ask", methods=["POST"])
 def ask_question():
     data = request.get_json()
-    question, context = data.get("question"), data.get("context")
-    if not question or not context: return jsonify({"error": "Question and context are required."}), 400
+    question, context, citations = data.get("question"), data.get("context"), []
+    index_id = data.get("index_id")
+    if not index_id and data.get("job_id"):
+        job = job_manager.get(data["job_id"])
+        if job and job.result: index_id = job.result.get("index_id")
+    if question and index_id:
+        try: index = load_transcript_index(index_id)
+        except KeyError: return jsonify({"error": "No transcript index found for this video. Please upload it again."}), 404
+        hits = sorted(index.search(question, RETRIEVAL_TOP_K, embedding_model=RETRIEVAL_EMBEDDING_MODEL), key=lambda c: c["timestamp"])
+        citations = [{"timestamp": c["timestamp"], "formatted_timestamp": format_timestamp(c["timestamp"]), "text": c["text"], "score": c["score"]} for c in hits]
+        context = "\n\n".join(f"[{c['formatted_timestamp']}] {c['text']}" for c in citations) or "(No relevant excerpts found in the transcript.)"
+    if not question or not context: return jsonify({"error": "Question and context (or index_id) are required."}), 400
     system_message = "You are a helpful Q&A assistant. Your primary goal is to answer the user's question based on the provided video transcript. You may supplement with general knowledge, but always prioritize the transcript. If the answer isn't in the transcript, you can use general knowledge but must state that the information is not from the video."
     user_prompt = f"CONTEXT:\n\"\"\"\n{context}\n\"\"\"\n\nQUESTION: {question}"
     try:
-        answer = call_openai_api(user_prompt, system_message, "gpt-4o-mini", 300, 0.3)
-        return jsonify({"answer": answer})
+        answer = call_openai_api(user_prompt, system_message, "gpt-4o-mini", 300, 0.3, caller="ask")
+        return jsonify({"answer": answer, "citations": citations})
     except Exception as e:
         return jsonify({"error": f"LLM error: {e}"}), 500
 
@@ -123,7 +354,14 @@ def handle_command():
         return jsonify({"error": "Text is required."}), 400
 
     url_match = re.search(r'https?://[^\s]+', user_text)
-    
+    if url_match:
+        return jsonify({"intent": "upload_youtube_video", "parameters": {"url": url_match.group(0)}, "source": "url"})
+
+    # Most commands are short navigation phrases: answer them locally and only ask the LLM when unsure.
+    routed = intent_router.route(user_text) if intent_router else None
+    if routed:
+        return jsonify(routed)
+
     system_message = """You are a command interpreter. Analyze the user's text and determine their intent.
     Respond with a JSON object containing an 'intent' and optional 'parameters'.
     
@@ -138,64 +376,188 @@ def handle_command():
     - "go home" -> {"intent": "navigate", "parameters": {"page": "home"}}
     - "show me the generated documentation" -> {"intent": "scroll_to_section", "parameters": {"section": "docs"}}
     """
-    
-    if url_match:
-        return jsonify({"intent": "upload_youtube_video", "parameters": {"url": url_match.group(0)}})
 
     try:
-        response_content = call_openai_api(user_text, system_message, "gpt-4o-mini", 100, 0.1, json_mode=True)
-        return jsonify(json.loads(response_content))
+        command = call_openai_api(user_text, system_message, "gpt-4o-mini", 100, 0.1, json_mode=True, caller="command", parse=json.loads)
+        return jsonify({**command, "source": "llm"})
     except Exception as e:
         return jsonify({"error": f"Command interpretation error: {e}"}), 500
 
-@app.route("/upload", methods=["POST"])
-def upload_video():
-    global transcription_model
-    if not transcription_model: return jsonify({"error": "Transcription model is not loaded."}), 500
-    video_url = request.form.get("video_url"); language = request.form.get("language", "en")
-    processing_path, audio_path = None, None
+def process_video(job: Job, language: str, video_url: str | None = None, upload: dict | None = None, stream: bool = False, include_timings: bool = False) -> dict:
+    processing_path, started, status = None, time.perf_counter(), "failed"
     video_id, video_playback_url, video_download_url, video_title = None, None, None, "video_analysis"
+    chunker, section_futures, downloads = None, [], ExitStack()
+    def on_segment(seg):
+        job.publish("segment", transcript_entry(seg))
+        # In streaming mode a chunk is documented as soon as it closes, overlapping with transcription.
+        if stream:
+            for chunk in chunker.add(seg): section_futures.append(submit_section(job, chunk, len(section_futures)))
     try:
         if video_url:
-            video_id = get_youtube_video_id(video_url); temp_dir = 'temp_downloads'
-            if not os.path.exists(temp_dir): os.makedirs(temp_dir)
-            ydl_opts = {'outtmpl': os.path.join(temp_dir, f"{uuid.uuid4().hex}.mp4"), 'format': 'best[ext=mp4]/best'}
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(video_url, download=True)
-                processing_path = info['requested_downloads'][0]['filepath']
-                video_title = info.get('title', 'youtube_video')
+            video_id = get_youtube_video_id(video_url); source_key = f"youtube:{video_id}" if video_id else None
         else:
-            file = request.files.get("video");
-            if not file or not file.filename: raise RuntimeError("No video file provided.")
-            base_filename = secure_filename(file.filename); video_title, _ = os.path.splitext(base_filename)
-            filename = f"{uuid.uuid4().hex}_{base_filename}"
-            processing_path = os.path.join(app.config['UPLOAD_FOLDER'], filename); file.save(processing_path)
-            video_playback_url = f"/videos/{filename}"; video_download_url = video_playback_url
-        audio_path = f"temp_{uuid.uuid4().hex}.wav"
-        subprocess.run(['ffmpeg', '-i', processing_path, '-ar', '16000', '-ac', '1', '-c:a', 'pcm_s16le', audio_path], check=True, capture_output=True)
-        result = transcription_model.transcribe(whisperx.load_audio(audio_path), language=language)
-        segments = result.get("segments", [])
-        transcript = [{"text": s["text"].strip(), "start": s.get("start", 0), "formatted_timestamp": format_timestamp(s.get("start", 0))} for s in segments]
-        sections, faqs = [], []
+            processing_path, video_title = upload["path"], upload["video_title"]
+            video_playback_url = upload["video_playback_url"]; video_download_url = video_playback_url
+            source_key = f"sha256:{hash_file(processing_path)}"
+        # The model is only chosen once the duration is known, so any transcript from a model this request could use is a hit.
+        transcript_keys = [make_key(source_key, language, m.name, m.compute_type) for m in model_registry.candidates(language)] if source_key else []
+        cached = next((c for key in transcript_keys if (c := result_cache.get("transcripts", key))), None)
+        if cached:
+            app_logger.info(f"Job {job.id}: transcript cache hit for {source_key}")
+            segments = cached["segments"]
+            if video_url: video_title = cached.get("video_title", video_title)
+            for seg in segments: job.publish("segment", transcript_entry(seg))
+        else:
+            if video_url:
+                job.set_stage("downloading")
+                with timed(STAGE_SECONDS, job.timings, stage="download"):
+                    processing_path, video_title = downloads.enter_context(youtube_cache.fetch(video_url, video_id))
+            audio = upload.get("audio") if upload else None
+            if audio is None:
+                job.set_stage("decoding")
+                with timed(STAGE_SECONDS, job.timings, stage="decode"):
+                    audio = decode_audio(processing_path, memmap_after_seconds=AUDIO_MEMMAP_AFTER_SECONDS, scratch_dir=AUDIO_SCRATCH_DIR)
+            duration = len(audio) / SAMPLE_RATE
+            model = model_registry.select(language, duration)
+            # Streamed chunks get the same length-aware target as chunk_segments, estimated from the duration.
+            if stream: chunker = StreamingChunker(target_chunk_tokens(int(duration * CHUNK_TOKENS_PER_SECOND), **CHUNK_SETTINGS))
+            windows = transcription_windows(model, audio, stream)
+            job.set_stage("transcribing", total=len(windows))
+            with timed(STAGE_SECONDS, job.timings, stage="transcribe"):
+                segments = transcribe_audio(model, audio, language, windows, on_segment=on_segment, on_window=job.advance)
+            if stream:
+                for chunk in chunker.flush(): section_futures.append(submit_section(job, chunk, len(section_futures)))
+            if source_key: result_cache.set("transcripts", make_key(source_key, language, model.name, model.compute_type), {"segments": segments, "video_title": video_title})
+        transcript = [transcript_entry(s) for s in segments]
+        sections, faqs, text_key, index_id = [], [], None, None
         if transcript:
             full_text = " ".join(s['text'] for s in transcript)
-            for chunk in chunk_segments(segments):
-                try:
-                    sections.append({"title": generate_title(chunk["text"]), "summary": summarize_text(chunk["text"]), "timestamp": chunk["timestamp"]})
-                except Exception as e:
-                    sections.append({"title": "Error Generating Section", "summary": str(e), "timestamp": chunk.get("timestamp", 0)})
-            faqs = generate_faqs(full_text)
-        return jsonify({
+            # Downstream stages are keyed on the transcript content, so a prompt or chunking change only recomputes its own stage.
+            text_key = make_key(full_text)
+            index_id = make_key(text_key, RETRIEVAL_CHUNK_TOKENS, RETRIEVAL_EMBEDDING_MODEL)
+            with timed(STAGE_SECONDS, job.timings, stage="index"): build_transcript_index(index_id, segments)
+            sections_key = make_key(text_key, CHUNK_SETTINGS, SECTION_SYSTEM_MESSAGE, SECTION_LLM_PARAMS)
+            streamed = bool(section_futures)
+            sections = result_cache.get("sections", sections_key) if not streamed else None
+            if sections is None:
+                if not section_futures: section_futures = [submit_section(job, chunk, i) for i, chunk in enumerate(chunk_segments(segments, **CHUNK_SETTINGS))]
+                with timed(STAGE_SECONDS, job.timings, stage="documenting"): sections = collect_sections(job, section_futures)
+                # sections_key describes chunk_segments' chunks, so sections from streamed chunks are not cached under it.
+                if not streamed and not any(s["title"] == SECTION_ERROR_TITLE for s in sections): result_cache.set("sections", sections_key, sections)
+            else:
+                for i, section in enumerate(sections): job.publish("section", {"index": i, **section})
+            # FAQs are mapped over the section summaries; chunk text stands in if no section succeeded.
+            faq_sources = [s["summary"] for s in sections if s["title"] != SECTION_ERROR_TITLE] or [c["text"] for c in chunk_segments(segments, **CHUNK_SETTINGS)]
+            faqs_key = make_key(faq_sources, FAQ_MAP_SYSTEM_MESSAGE, FAQ_REDUCE_SYSTEM_MESSAGE, FAQ_LLM_PARAMS, FAQ_MAP_GROUP_SIZE)
+            faqs = result_cache.get("faqs", faqs_key)
+            if faqs is None:
+                job.set_stage("faqs", total=-(-len(faq_sources) // FAQ_MAP_GROUP_SIZE))
+                with timed(STAGE_SECONDS, job.timings, stage="faqs"): faqs = generate_faqs(faq_sources, on_progress=job.advance)
+                if faqs: result_cache.set("faqs", faqs_key, faqs)
+        result = {
             "full_transcript_segments": transcript, "documentation": sections, "faqs": faqs,
             "video_id": video_id, "video_playback_url": video_playback_url,
-            "video_download_url": video_download_url, "video_title": video_title
-        })
-    except Exception as e:
-        app_logger.error(f"An error occurred during upload: {e}", exc_info=True)
-        return jsonify({"error": str(e)}), 500
+            "video_download_url": video_download_url, "video_title": video_title, "index_id": index_id
+        }
+        if include_timings: result["timings"] = {**job.timings, "total": round(time.perf_counter() - started, 4)}
+        status = "done"
+        return result
+    except Exception:
+        ERRORS.inc(stage=job.stage)
+        raise
     finally:
-        if audio_path and os.path.exists(audio_path): os.remove(audio_path)
-        if video_url and processing_path and os.path.exists(processing_path): os.remove(processing_path)
+        JOB_SECONDS.observe(time.perf_counter() - started, status=status)
+        downloads.close()
+
+@app.route("/metrics")
+def metrics():
+    return Response(metrics_registry.render(), mimetype="text/plain; version=0.0.4")
+
+@app.route("/scheduler/stats")
+def scheduler_stats():
+    schedulers = {m.name: m.batch_scheduler.stats() for m in model_registry.loaded() if m.batch_scheduler}
+    if not schedulers: return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **schedulers.get(model_registry.default, next(iter(schedulers.values()))), "models": schedulers})
+
+@app.route("/healthz")
+def healthz():
+    return jsonify({"status": "ok"})
+
+@app.route("/readyz")
+def readyz():
+    # Ready once any transcription model has loaded; the others keep warming up in the background.
+    status = model_registry.status()
+    return jsonify(status), 200 if status["ready"] else 503
+
+def remove_file(path: str | None):
+    if path and os.path.exists(path):
+        try: os.remove(path)
+        except OSError as e: app_logger.warning(f"Could not remove {path}: {e}")
+
+@app.route("/upload", methods=["POST"])
+def upload_video():
+    if not model_registry.is_ready():
+        return jsonify({"error": "Transcription model is still loading, retry shortly.", **model_registry.status()}), 503, {"Retry-After": "10"}
+    # Checked before the body is read or decoded so a full queue doesn't cost a whole upload and ffmpeg pass.
+    try: job_manager.ensure_capacity()
+    except QueueFullError as e: return jsonify({"error": str(e)}), 503
+    # A raw media body is decoded while it is still arriving; options then come from the query string.
+    raw_body = request.mimetype == "application/octet-stream" or request.mimetype.startswith(("audio/", "video/"))
+    options = request.args if raw_body else request.form
+    video_url = options.get("video_url"); language = options.get("language", "en")
+    stream = options.get("stream", STREAM_TRANSCRIPTION).lower() in ("1", "true", "on")
+    include_timings = options.get("timings", "").lower() in ("1", "true", "on")
+    upload, processing_path = None, None
+    if raw_body and not video_url:
+        base_filename = secure_filename(options.get("filename", "")) or "upload.mp4"; video_title, _ = os.path.splitext(base_filename)
+        filename = f"{uuid.uuid4().hex}_{base_filename}"
+        processing_path = os.path.join(app.config['UPLOAD_FOLDER'], filename)
+        try:
+            audio = decode_audio(request.stream, tee_path=processing_path, memmap_after_seconds=AUDIO_MEMMAP_AFTER_SECONDS, scratch_dir=AUDIO_SCRATCH_DIR)
+        except Exception as e:
+            app_logger.error(f"Could not decode uploaded video: {e}")
+            remove_file(processing_path)
+            return jsonify({"error": str(e)}), 400
+        upload = {"path": processing_path, "video_title": video_title, "video_playback_url": f"/videos/{filename}", "audio": audio}
+    elif not video_url:
+        file = request.files.get("video")
+        if not file or not file.filename: return jsonify({"error": "No video file provided."}), 400
+        base_filename = secure_filename(file.filename); video_title, _ = os.path.splitext(base_filename)
+        filename = f"{uuid.uuid4().hex}_{base_filename}"
+        processing_path = os.path.join(app.config['UPLOAD_FOLDER'], filename); file.save(processing_path)
+        upload = {"path": processing_path, "video_title": video_title, "video_playback_url": f"/videos/{filename}"}
+    try:
+        job = job_manager.submit(process_video, language, video_url=video_url, upload=upload, stream=stream, include_timings=include_timings)
+    except QueueFullError as e:
+        remove_file(processing_path)
+        return jsonify({"error": str(e)}), 503
+    return jsonify({"job_id": job.id, "status_url": f"/jobs/{job.id}", "events_url": f"/jobs/{job.id}/events", "result_url": f"/jobs/{job.id}/result"}), 202
+
+@app.route("/jobs/<job_id>")
+def job_status(job_id):
+    job = job_manager.get(job_id)
+    if not job: return jsonify({"error": "Job not found."}), 404
+    return jsonify(job.to_dict())
+
+@app.route("/jobs/<job_id>/events")
+def job_events(job_id):
+    job = job_manager.get(job_id)
+    if not job: return jsonify({"error": "Job not found."}), 404
+    last_event_id = request.headers.get("Last-Event-ID", request.args.get("last_event_id", "-1"))
+    start = int(last_event_id) + 1 if last_event_id.lstrip("-").isdigit() else 0
+    def event_stream():
+        for index, event, data in job.iter_events(start):
+            if event is None: yield ": keep-alive\n\n"
+            else: yield f"id: {index}\nevent: {event}\ndata: {json.dumps(data)}\n\n"
+    return Response(event_stream(), mimetype="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.route("/jobs/<job_id>/result")
+def job_result(job_id):
+    job = job_manager.get(job_id)
+    if not job: return jsonify({"error": "Job not found."}), 404
+    if job.status == "failed": return jsonify({"error": job.error}), 500
+    if job.status != "done": return jsonify(job.to_dict()), 202
+    return jsonify(job.result)
 
 if __name__ == '__main__':
     app.run(debug=True, port=5000)
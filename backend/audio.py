@@ -0,0 +1,121 @@
+# audio.py - Audio helpers: single-pass ffmpeg decoding and energy-based silence detection
+
+import os
+import subprocess
+import tempfile
+import threading
+import numpy as np
+
+SAMPLE_RATE = 16000
+READ_BLOCK_BYTES = 1 << 20
+
+class _PcmSink:
+    # Collects decoded float32 blocks in memory, spilling to a scratch file once the recording gets long.
+    def __init__(self, spill_after_samples: int | None, scratch_dir: str | None):
+        self.spill_after_samples, self.scratch_dir = spill_after_samples, scratch_dir
+        self.blocks, self.samples, self.file = [], 0, None
+
+    def write(self, block: np.ndarray):
+        if self.file is None and self.spill_after_samples is not None and self.samples + len(block) > self.spill_after_samples:
+            self.file = tempfile.NamedTemporaryFile(prefix="audio_", suffix=".f32", dir=self.scratch_dir, delete=False)
+            for b in self.blocks: self.file.write(b.tobytes())
+            self.blocks = []
+        if self.file: self.file.write(block.tobytes())
+        else: self.blocks.append(block)
+        self.samples += len(block)
+
+    def result(self) -> np.ndarray:
+        if self.file is None: return np.concatenate(self.blocks) if self.blocks else np.zeros(0, dtype=np.float32)
+        self.file.close()
+        # Copy-on-write keeps the array writable for consumers without touching the scratch file.
+        audio = np.memmap(self.file.name, dtype=np.float32, mode="c", shape=(self.samples,))
+        try: os.remove(self.file.name)  # the mapping stays valid on POSIX once the name is gone
+        except OSError: pass
+        return audio
+
+    def discard(self):
+        if self.file:
+            self.file.close()
+            try: os.remove(self.file.name)
+            except OSError: pass
+
+def decode_audio(source, sample_rate: int = SAMPLE_RATE, tee_path: str | None = None, memmap_after_seconds: float | None = None, scratch_dir: str | None = None) -> np.ndarray:
+    # source is a file path, or a readable stream that is fed to ffmpeg (and copied to tee_path) as it arrives.
+    from_stream = not isinstance(source, str)
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-threads', '0', '-i', 'pipe:0' if from_stream else source,
+           '-f', 's16le', '-ac', '1', '-ar', str(sample_rate), 'pipe:1']
+    if not from_stream: cmd.insert(1, '-nostdin')
+    proc = subprocess.Popen(cmd, stdin=subprocess.PIPE if from_stream else subprocess.DEVNULL, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    stderr, feed_error = [], []
+    threads = [threading.Thread(target=lambda: stderr.append(proc.stderr.read()), daemon=True)]
+    if from_stream: threads.append(threading.Thread(target=_feed, args=(source, proc.stdin, tee_path, feed_error), daemon=True))
+    for t in threads: t.start()
+    sink = _PcmSink(int(memmap_after_seconds * sample_rate) if memmap_after_seconds else None, scratch_dir)
+    try:
+        while block := proc.stdout.read(READ_BLOCK_BYTES):
+            sink.write(np.frombuffer(block[:len(block) // 2 * 2], dtype=np.int16).astype(np.float32) / 32768.0)
+        proc.wait()
+        for t in threads: t.join()
+    except BaseException:
+        proc.kill(); sink.discard()
+        raise
+    if feed_error: sink.discard(); raise feed_error[0]
+    if proc.returncode != 0:
+        sink.discard()
+        # Containers with their index at the end (e.g. some MP4s) cannot be decoded from a pipe; retry from the saved copy.
+        if from_stream and tee_path: return decode_audio(tee_path, sample_rate, memmap_after_seconds=memmap_after_seconds, scratch_dir=scratch_dir)
+        raise RuntimeError(f"Failed to decode audio: {b''.join(stderr).decode(errors='replace').strip()}")
+    return sink.result()
+
+def _feed(source, ffmpeg_stdin, tee_path: str | None, errors: list):
+    tee = open(tee_path, "wb") if tee_path else None
+    try:
+        while block := source.read(READ_BLOCK_BYTES):
+            if tee: tee.write(block)
+            if ffmpeg_stdin:
+                try: ffmpeg_stdin.write(block)
+                except (BrokenPipeError, OSError): ffmpeg_stdin = None  # ffmpeg gave up; keep saving the upload for the retry
+    except Exception as e:
+        errors.append(e)
+    finally:
+        if tee: tee.close()
+        if ffmpeg_stdin:
+            try: ffmpeg_stdin.close()
+            except OSError: pass
+
+def frame_energy(audio: np.ndarray, sample_rate: int = SAMPLE_RATE, frame_seconds: float = 0.03, smooth_seconds: float = 0.3) -> tuple[np.ndarray, int]:
+    frame = max(1, int(sample_rate * frame_seconds)); n_frames = len(audio) // frame
+    if n_frames == 0: return np.zeros(0, dtype=np.float32), frame
+    energy = np.sqrt(np.mean(np.square(audio[:n_frames * frame].reshape(n_frames, frame), dtype=np.float32), axis=1))
+    # A moving average makes the minimum land inside a pause rather than on a single quiet frame mid-word.
+    k = max(1, int(smooth_seconds / frame_seconds))
+    return np.convolve(energy, np.ones(k, dtype=np.float32) / k, mode="same"), frame
+
+def silence_windows(audio: np.ndarray, max_window_seconds: float, sample_rate: int = SAMPLE_RATE, min_window_fraction: float = 0.5) -> list[tuple[int, int]]:
+    if len(audio) == 0: return []
+    energy, frame = frame_energy(audio, sample_rate)
+    max_samples = int(max_window_seconds * sample_rate)
+    max_frames = max(1, max_samples // frame); min_frames = max(1, int(max_frames * min_window_fraction))
+    cuts = [0]
+    # Bounded in samples, not frames: the partial frame at the end must fit too, or the last window overruns the cap.
+    while len(audio) - cuts[-1] * frame > max_samples:
+        lo, hi = cuts[-1] + min_frames, min(cuts[-1] + max_frames, len(energy))
+        cuts.append(lo + int(np.argmin(energy[lo:hi])) if lo < hi else cuts[-1] + max_frames)
+    bounds = [c * frame for c in cuts] + [len(audio)]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def shard_bounds(audio: np.ndarray, n_shards: int, sample_rate: int = SAMPLE_RATE, search_seconds: float = 15.0) -> list[tuple[int, int]]:
+    # Cuts near each even split point, moved to the quietest spot within search_seconds.
+    energy, frame = frame_energy(audio, sample_rate)
+    if n_shards <= 1 or len(energy) == 0: return [(0, len(audio))] if len(audio) else []
+    radius = max(1, int(search_seconds * sample_rate / frame)); cuts = [0]
+    for i in range(1, n_shards):
+        target = i * len(energy) // n_shards
+        lo, hi = max(cuts[-1] + 1, target - radius), min(len(energy), target + radius + 1)
+        if lo < hi: cuts.append(lo + int(np.argmin(energy[lo:hi])))
+    bounds = [c * frame for c in cuts] + [len(audio)]
+    return [(a, b) for a, b in zip(bounds, bounds[1:]) if b > a]
+
+def drop_silent_windows(audio: np.ndarray, windows: list, min_rms: float = 0.003) -> list:
+    # Whisper tends to hallucinate text on pure silence, so near-silent windows are not worth a model call.
+    return [(a, b) for a, b in windows if b > a and float(np.sqrt(np.mean(np.square(audio[a:b], dtype=np.float32)))) >= min_rms]
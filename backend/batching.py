@@ -0,0 +1,86 @@
+# batching.py - Central scheduler that batches speech windows from all in-flight jobs through one model
+
+import threading
+import time
+import logging
+from concurrent.futures import Future
+
+app_logger = logging.getLogger(__name__)
+
+class _Request:
+    __slots__ = ("audio", "language", "future", "enqueued_at")
+
+    def __init__(self, audio, language: str):
+        self.audio, self.language, self.future, self.enqueued_at = audio, language, Future(), time.monotonic()
+
+class BatchScheduler:
+    # run_batch(language, [audio, ...]) -> [text, ...]; a batch only mixes windows that share a language.
+    def __init__(self, run_batch, batch_size: int = 16, max_wait_seconds: float = 0.05):
+        self.run_batch, self.batch_size, self.max_wait_seconds = run_batch, batch_size, max_wait_seconds
+        self._queue: list[_Request] = []
+        self._cond = threading.Condition()
+        self._stopped = False
+        self.batches = self.items = self.last_batch_size = 0
+        self.queue_wait_seconds = 0.0
+        threading.Thread(target=self._loop, name="batch-scheduler", daemon=True).start()
+
+    def submit(self, audio, language: str) -> Future:
+        request = _Request(audio, language)
+        with self._cond:
+            self._queue.append(request); self._cond.notify()
+        return request.future
+
+    def stats(self) -> dict:
+        with self._cond:
+            return {
+                "queue_depth": len(self._queue), "batch_size": self.batch_size, "batches": self.batches, "items": self.items,
+                "last_batch_size": self.last_batch_size,
+                "mean_batch_fill": round(self.items / (self.batches * self.batch_size), 4) if self.batches else 0.0,
+                "mean_queue_wait_seconds": round(self.queue_wait_seconds / self.items, 4) if self.items else 0.0
+            }
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True; self._cond.notify_all()
+
+    def _next_batch(self) -> list | None:
+        with self._cond:
+            while not self._queue and not self._stopped: self._cond.wait()
+            if self._stopped: return None
+            # Wait for a full batch, but never hold the oldest window longer than max_wait_seconds.
+            deadline = self._queue[0].enqueued_at + self.max_wait_seconds
+            while len(self._queue) < self.batch_size and (remaining := deadline - time.monotonic()) > 0: self._cond.wait(remaining)
+            language, batch, rest = self._queue[0].language, [], []
+            for request in self._queue:
+                (batch if request.language == language and len(batch) < self.batch_size else rest).append(request)
+            self._queue = rest
+            now = time.monotonic()
+            self.batches += 1; self.items += len(batch); self.last_batch_size = len(batch)
+            self.queue_wait_seconds += sum(now - r.enqueued_at for r in batch)
+            return batch
+
+    def _loop(self):
+        while (batch := self._next_batch()) is not None:
+            batch = [r for r in batch if r.future.set_running_or_notify_cancel()]
+            if not batch: continue
+            try:
+                texts = self.run_batch(batch[0].language, [r.audio for r in batch])
+                for request, text in zip(batch, texts): request.future.set_result(text)
+            except Exception as e:
+                app_logger.error(f"Batched transcription failed for {len(batch)} windows: {e}")
+                for request in batch: request.future.set_exception(e)
+
+def whisperx_batch_runner(model):
+    # Drives WhisperX's batched pipeline directly with pre-cut windows, the same way its transcribe() does after VAD.
+    from faster_whisper.tokenizer import Tokenizer
+
+    def run_batch(language: str, windows: list) -> list:
+        tokenizer = getattr(model, "tokenizer", None)
+        if tokenizer is None or tokenizer.language_code != language:
+            model.tokenizer = Tokenizer(model.model.hf_tokenizer, model.model.model.is_multilingual, task="transcribe", language=language)
+        texts = []
+        for out in model([{"inputs": w} for w in windows], batch_size=len(windows), num_workers=0):
+            text = out["text"]
+            texts.append((text[0] if isinstance(text, list) else text).strip())
+        return texts
+    return run_batch
@@ -0,0 +1,82 @@
+# fake_openai.py - Local OpenAI-compatible chat completions server with configurable latency and failures
+
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+class FakeOpenAIServer:
+    def __init__(self, latency_seconds: float = 0.5, jitter_seconds: float = 0.2, failure_rate: float = 0.0, rate_limit_rate: float = 0.0, seed: int = 0):
+        self.latency_seconds, self.jitter_seconds = latency_seconds, jitter_seconds
+        self.failure_rate, self.rate_limit_rate = failure_rate, rate_limit_rate
+        self.requests = self.failures = 0
+        self._random, self._lock = random.Random(seed), threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        return f"http://127.0.0.1:{self._server.server_address[1]}/v1"
+
+    def start(self) -> "FakeOpenAIServer":
+        threading.Thread(target=self._server.serve_forever, name="fake-openai", daemon=True).start()
+        return self
+
+    def stop(self):
+        self._server.shutdown(); self._server.server_close()
+
+    def _outcome(self) -> tuple[float, int]:
+        with self._lock:
+            self.requests += 1
+            delay = max(0.0, self._random.gauss(self.latency_seconds, self.jitter_seconds))
+            roll = self._random.random()
+            status = 429 if roll < self.rate_limit_rate else 500 if roll < self.rate_limit_rate + self.failure_rate else 200
+            if status != 200: self.failures += 1
+        return delay, status
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args): pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                delay, status = server._outcome()
+                time.sleep(delay)
+                if status != 200:
+                    return self._send(status, {"error": {"message": "Simulated failure", "type": "server_error" if status == 500 else "rate_limit_error"}})
+                if not self.path.rstrip("/").endswith("/chat/completions"):
+                    return self._send(404, {"error": {"message": f"Unknown path {self.path}"}})
+                content = fake_completion(body)
+                prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages", [])) // 4
+                self._send(200, {
+                    "id": f"chatcmpl-fake-{time.time_ns()}", "object": "chat.completion", "created": int(time.time()), "model": body.get("model", "fake"),
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": len(content) // 4, "total_tokens": prompt_tokens + len(content) // 4}
+                })
+
+            def _send(self, status: int, payload: dict):
+                data = json.dumps(payload).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json"); self.send_header("Content-Length", str(len(data)))
+                self.end_headers(); self.wfile.write(data)
+        return Handler
+
+def fake_completion(body: dict) -> str:
+    # Shapes the reply after what each caller in app.py parses, based on its system message.
+    messages = body.get("messages", [])
+    system = messages[0].get("content", "") if messages else ""
+    user = messages[-1].get("content", "") if messages else ""
+    words = user.split()[:12]
+    if body.get("response_format", {}).get("type") == "json_object":
+        # 'intent' goes first: the /command prompt also mentions the 'faqs' page.
+        if "'intent'" in system:
+            return json.dumps({"intent": "answer_question", "parameters": {}})
+        if "'faqs'" in system:
+            return json.dumps({"faqs": [{"question": f"What is said about {w}?", "answer": f"The video discusses {w}."} for w in words[-3:] or ["the topic"]]})
+        if "'title'" in system:
+            return json.dumps({"title": " ".join(words[:5]).title() or "Untitled Section", "summary": "## Summary\n\n- " + " ".join(words)})
+        return json.dumps({})
+    return "This is a simulated answer based on: " + " ".join(words)
@@ -0,0 +1,40 @@
+# fixtures.py - Synthetic speech-like audio: voiced syllables with pitch drift, grouped into utterances with pauses
+
+import os
+import wave
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+def synthesize_speech(duration_seconds: float, seed: int = 0, sample_rate: int = SAMPLE_RATE, block_seconds: float = 60.0):
+    # Yields int16 blocks so multi-hour fixtures never sit in memory in one piece.
+    rng = np.random.default_rng(seed)
+    total, produced = int(duration_seconds * sample_rate), 0
+    while produced < total:
+        n = min(int(block_seconds * sample_rate), total - produced)
+        block, t = np.zeros(n, dtype=np.float32), 0
+        while t < n:
+            utterance_end = min(n, t + int(rng.uniform(2.0, 8.0) * sample_rate))
+            f0 = rng.uniform(100, 220)
+            while t < utterance_end:
+                length = int(rng.uniform(0.12, 0.3) * sample_rate); end = min(utterance_end, t + length)
+                ts = np.arange(end - t, dtype=np.float32) / sample_rate
+                f = f0 * (1 + 0.05 * rng.standard_normal())
+                voice = sum(np.sin(2 * np.pi * f * k * ts) / k for k in (1, 2, 3))
+                block[t:end] = 0.25 * voice * np.hanning(end - t) + 0.01 * rng.standard_normal(end - t)
+                t = end + int(rng.uniform(0.02, 0.08) * sample_rate)
+            t = utterance_end + int(rng.uniform(0.3, 1.2) * sample_rate)
+        block += 0.002 * rng.standard_normal(n).astype(np.float32)
+        produced += n
+        yield (np.clip(block, -1, 1) * 32767).astype(np.int16)
+
+def speech_fixture(directory: str, minutes: float, seed: int = 0) -> str:
+    path = os.path.join(directory, f"speech_{minutes:g}min_seed{seed}.wav")
+    if os.path.exists(path): return path
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with wave.open(tmp_path, "wb") as f:
+        f.setnchannels(1); f.setsampwidth(2); f.setframerate(SAMPLE_RATE)
+        for block in synthesize_speech(minutes * 60, seed): f.writeframes(block.tobytes())
+    os.replace(tmp_path, path)
+    return path
@@ -0,0 +1,150 @@
+# run.py - End-to-end benchmark of /upload, /ask and /command against local stand-ins for OpenAI, YouTube and WhisperX
+#
+# Usage (needs ffmpeg on PATH):
+#   python benchmarks/run.py --minutes 1 10 60 --concurrency 1 4 --output bench.json
+#   python benchmarks/run.py --minutes 1 10 60 --concurrency 1 4 --compare bench.json
+# Sharded transcription and the batch scheduler spawn or drive a real WhisperX model, so pass --real-model to cover them;
+# the real yt_dlp then needs real videos (--video-urls), or use --source file.
+
+import argparse
+import io
+import json
+import os
+import random
+import string
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from fake_openai import FakeOpenAIServer
+from fixtures import speech_fixture
+import stubs
+
+ASK_QUESTIONS = ["What is the main topic?", "How is the model trained?", "What example is given?", "What does the summary say?"]
+COMMANDS = ["go home", "take me to the faq page", "scroll to the documentation", "what is this video about?", "delete everything"]
+
+def percentile(values: list, q: float) -> float:
+    ordered = sorted(values)
+    if not ordered: return 0.0
+    position = q * (len(ordered) - 1); lower = int(position); upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+def summarize(values: list, wall_seconds: float | None = None) -> dict:
+    summary = {"count": len(values), "p50": round(percentile(values, 0.5), 4), "p95": round(percentile(values, 0.95), 4)}
+    if wall_seconds: summary["throughput_per_second"] = round(len(values) / wall_seconds, 4)
+    return summary
+
+def load_app(args, workdir: str):
+    fake = FakeOpenAIServer(args.llm_latency, args.llm_jitter, args.llm_failure_rate, args.llm_rate_limit_rate, args.seed).start()
+    os.environ.update({
+        "OPENAI_API_KEY": "benchmark", "OPENAI_BASE_URL": fake.base_url, "CACHE_DIR": os.path.join(workdir, "cache"),
+        "LLM_CACHE": "off", "JOB_WORKERS": str(max(args.concurrency)), "JOB_QUEUE_LIMIT": "100000",
+        "STREAM_TRANSCRIPTION": "on" if args.stream else "off"
+    })
+    if not args.real_model: stubs.install(None, args.realtime_factor, args.download_mb_per_second)
+    os.chdir(workdir)  # app.py creates uploads/ and youtube_cache/ relative to the working directory
+    import app
+    if not app.model_registry.wait_ready(timeout=600): raise RuntimeError(f"Transcription model did not load: {app.model_registry.status()}")
+    return app, fake
+
+def run_upload(flask_app, source: str, fixture_bytes: bytes, video_url: str | None = None) -> dict:
+    client, started = flask_app.test_client(), time.perf_counter()
+    if source == "youtube":
+        if not video_url:
+            video_id = "".join(random.choices(string.ascii_letters + string.digits, k=11))  # a fresh ID keeps the caches cold
+            video_url = f"https://www.youtube.com/watch?v={video_id}"
+        response = client.post("/upload", data={"video_url": video_url, "timings": "true"})
+    else:
+        upload = io.BytesIO(fixture_bytes + os.urandom(16))  # trailing bytes change the content hash, not the audio
+        response = client.post("/upload", data={"video": (upload, "fixture.wav"), "timings": "true"}, content_type="multipart/form-data")
+    job_id = response.get_json()["job_id"]
+    while (status := client.get(f"/jobs/{job_id}").get_json()["status"]) not in ("done", "failed"): time.sleep(0.05)
+    result = client.get(f"/jobs/{job_id}/result").get_json()
+    return {"latency": time.perf_counter() - started, "ok": status == "done", "timings": result.get("timings", {}), "index_id": result.get("index_id")}
+
+def run_json(flask_app, path: str, payload: dict, required_key: str) -> dict:
+    started = time.perf_counter()
+    response = flask_app.test_client().post(path, json=payload)
+    ok = response.status_code == 200 and required_key in (response.get_json(silent=True) or {})
+    return {"latency": time.perf_counter() - started, "ok": ok}
+
+def run_concurrently(fn, items: list, concurrency: int) -> tuple[list, float]:
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool: results = list(pool.map(fn, items))
+    return results, time.perf_counter() - started
+
+def benchmark(args) -> list:
+    workdir = tempfile.mkdtemp(prefix="viddocu_bench_")
+    fixtures_dir = os.path.abspath(args.fixtures_dir or os.path.join(workdir, "fixtures"))
+    app, fake = load_app(args, workdir)
+    rows = []
+    try:
+        for minutes in args.minutes:
+            fixture_path = speech_fixture(fixtures_dir, minutes, args.seed)
+            stubs.FakeYoutubeDL.fixture_path = fixture_path
+            with open(fixture_path, "rb") as f: fixture_bytes = f.read()
+            for concurrency in args.concurrency:
+                scenario = f"{minutes:g}min c={concurrency}"
+                # Real URLs are cycled, so repeats of the same video measure the warm download and transcript caches.
+                urls = [args.video_urls[i % len(args.video_urls)] if args.video_urls else None for i in range(concurrency * args.rounds)]
+                uploads, wall = run_concurrently(lambda url: run_upload(app.app, args.source, fixture_bytes, url), urls, concurrency)
+                rows.append((scenario, "upload.end_to_end", summarize([u["latency"] for u in uploads], wall), sum(not u["ok"] for u in uploads)))
+                for stage in sorted({s for u in uploads for s in u["timings"]}):
+                    rows.append((scenario, f"upload.{stage}", summarize([u["timings"][stage] for u in uploads if stage in u["timings"]]), 0))
+                index_id = next((u["index_id"] for u in uploads if u["index_id"]), None)
+                if index_id:
+                    questions = [random.choice(ASK_QUESTIONS) for _ in range(args.requests)]
+                    asks, wall = run_concurrently(lambda q: run_json(app.app, "/ask", {"question": q, "index_id": index_id}, "answer"), questions, concurrency)
+                    rows.append((scenario, "ask", summarize([a["latency"] for a in asks], wall), sum(not a["ok"] for a in asks)))
+                commands = [random.choice(COMMANDS) for _ in range(args.requests)]
+                results, wall = run_concurrently(lambda text: run_json(app.app, "/command", {"text": text}, "intent"), commands, concurrency)
+                rows.append((scenario, "command", summarize([r["latency"] for r in results], wall), sum(not r["ok"] for r in results)))
+    finally:
+        fake.stop()
+    return [{"scenario": s, "metric": m, **summary, "errors": errors} for s, m, summary, errors in rows]
+
+def print_report(rows: list, baseline: list | None = None):
+    previous = {(r["scenario"], r["metric"]): r for r in baseline or []}
+    print(f"{'scenario':<16} {'metric':<26} {'n':>5} {'p50 s':>9} {'p95 s':>9} {'per s':>8} {'err':>4}" + ("   p50 vs baseline" if baseline else ""))
+    for row in rows:
+        line = f"{row['scenario']:<16} {row['metric']:<26} {row['count']:>5} {row['p50']:>9.3f} {row['p95']:>9.3f} {row.get('throughput_per_second', 0):>8.2f} {row['errors']:>4}"
+        before = previous.get((row["scenario"], row["metric"]))
+        if before and before["p50"]: line += f"   {(row['p50'] - before['p50']) / before['p50'] * 100:+.1f}%"
+        print(line)
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the VidDocu backend end to end against local stand-ins.")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[1, 10], help="Fixture lengths in minutes (1-120).")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4])
+    parser.add_argument("--rounds", type=int, default=1, help="Uploads per concurrent client.")
+    parser.add_argument("--requests", type=int, default=20, help="/ask and /command requests per scenario.")
+    parser.add_argument("--source", choices=("youtube", "file"), default="youtube")
+    parser.add_argument("--stream", action="store_true", help="Use streaming transcription windows.")
+    parser.add_argument("--llm-latency", type=float, default=0.5); parser.add_argument("--llm-jitter", type=float, default=0.2)
+    parser.add_argument("--llm-failure-rate", type=float, default=0.0); parser.add_argument("--llm-rate-limit-rate", type=float, default=0.0)
+    parser.add_argument("--realtime-factor", type=float, default=0.02, help="Stub model seconds of compute per second of audio.")
+    parser.add_argument("--download-mb-per-second", type=float, default=0.0, help="Simulated YouTube bandwidth; 0 is unlimited.")
+    parser.add_argument("--real-model", action="store_true", help="Use the installed yt_dlp and WhisperX instead of the stubs.")
+    parser.add_argument("--video-urls", nargs="+", help="Real YouTube URLs for --source youtube (required with --real-model).")
+    parser.add_argument("--fixtures-dir"); parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="Write results as JSON for later --compare runs.")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output run.")
+    args = parser.parse_args()
+    if args.real_model and args.source == "youtube" and not args.video_urls:
+        parser.error("--real-model downloads with the real yt_dlp: pass --video-urls or use --source file")
+    random.seed(args.seed)
+    baseline = None
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f: baseline = json.load(f)["results"]
+    output_path = os.path.abspath(args.output) if args.output else None
+    rows = benchmark(args)
+    print_report(rows, baseline)
+    if output_path:
+        with open(output_path, "w", encoding="utf-8") as f: json.dump({"config": vars(args), "results": rows}, f, indent=2)
+
+if __name__ == "__main__":
+    main()
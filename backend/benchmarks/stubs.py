@@ -0,0 +1,71 @@
+# stubs.py - Stand-ins for yt_dlp and WhisperX so the pipeline can be benchmarked offline and without a GPU
+
+import os
+import random
+import shutil
+import sys
+import threading
+import time
+import types
+
+WORDS = ("data model training network layer function value system example result process method input output "
+         "signal memory control design question answer lecture video section chapter topic detail summary").split()
+
+class TinyTranscriptionModel:
+    # Emits one segment per silence-bounded window and sleeps to mimic a configurable real-time factor.
+    def __init__(self, realtime_factor: float = 0.02, words_per_second: float = 2.5):
+        self.realtime_factor, self.words_per_second = realtime_factor, words_per_second
+        self._calls, self._lock = 0, threading.Lock()
+
+    def transcribe(self, audio, language: str | None = None, **kwargs) -> dict:
+        from audio import SAMPLE_RATE, drop_silent_windows, silence_windows
+        with self._lock: self._calls += 1; rng = random.Random(self._calls)  # distinct text per call keeps result caches cold
+        time.sleep(len(audio) / SAMPLE_RATE * self.realtime_factor)
+        segments = []
+        for a, b in drop_silent_windows(audio, silence_windows(audio, 8.0)):
+            start, end = a / SAMPLE_RATE, b / SAMPLE_RATE
+            n = max(1, int((end - start) * self.words_per_second))
+            text = " ".join(rng.choice(WORDS) for _ in range(n)).capitalize() + "."
+            segments.append({"text": " " + text, "start": round(start, 3), "end": round(end, 3)})
+        return {"segments": segments, "language": language or "en"}
+
+class FakeYoutubeDL:
+    fixture_path: str | None = None
+    bandwidth_bytes_per_second: float = 0.0
+
+    def __init__(self, opts: dict | None = None):
+        self.opts = opts or {}
+
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+
+    def extract_info(self, url: str, download: bool = True) -> dict:
+        video_id = url.rstrip("/").split("=")[-1].split("/")[-1][:11]
+        ext = os.path.splitext(self.fixture_path or "")[1].lstrip(".") or "wav"
+        info = {"id": video_id, "title": f"Benchmark video {video_id}", "ext": ext}
+        outtmpl = self.opts.get("outtmpl", "%(id)s.%(ext)s")
+        if isinstance(outtmpl, dict): outtmpl = outtmpl.get("default", "%(id)s.%(ext)s")
+        filepath = outtmpl % info
+        if download:
+            if self.bandwidth_bytes_per_second: time.sleep(os.path.getsize(self.fixture_path) / self.bandwidth_bytes_per_second)
+            os.makedirs(os.path.dirname(filepath) or ".", exist_ok=True)
+            shutil.copyfile(self.fixture_path, filepath)
+        return {**info, "requested_downloads": [{"filepath": filepath}]}
+
+def install(fixture_path: str, realtime_factor: float = 0.02, bandwidth_mb_per_second: float = 0.0):
+    # Must run before app.py is imported; torch is only replaced when it is not installed.
+    from audio import decode_audio
+    FakeYoutubeDL.fixture_path = fixture_path
+    FakeYoutubeDL.bandwidth_bytes_per_second = bandwidth_mb_per_second * 1024 * 1024
+    yt_dlp = types.ModuleType("yt_dlp"); yt_dlp.YoutubeDL = FakeYoutubeDL
+    whisperx = types.ModuleType("whisperx")
+    whisperx.load_model = lambda *args, **kwargs: TinyTranscriptionModel(realtime_factor)
+    whisperx.load_audio = lambda path, sr=16000: decode_audio(path, sr)
+    sys.modules["yt_dlp"], sys.modules["whisperx"] = yt_dlp, whisperx
+    try:
+        import torch  # noqa: F401
+    except ImportError:
+        torch = types.ModuleType("torch")
+        torch.cuda = types.SimpleNamespace(is_available=lambda: False)
+        torch.set_num_threads = lambda n: None
+        sys.modules["torch"] = torch
@@ -0,0 +1,72 @@
+# cache.py - Size-bounded, content-addressed on-disk cache for pipeline stage results
+
+import hashlib
+import json
+import os
+import threading
+import logging
+
+app_logger = logging.getLogger(__name__)
+
+def make_key(*parts) -> str:
+    return hashlib.sha256(json.dumps(parts, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+def hash_file(path: str, block_size: int = 1 << 20) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""): digest.update(block)
+    return digest.hexdigest()
+
+class ResultCache:
+    # Entries live at <directory>/<namespace>/<key>.json; mtime doubles as the LRU clock.
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory, self.max_bytes = directory, max_bytes
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._sizes = {path: os.path.getsize(path) for path in self._entries()}
+
+    def get(self, namespace: str, key: str):
+        path = self._path(namespace, key)
+        try:
+            with open(path, "r", encoding="utf-8") as f: value = json.load(f)
+            os.utime(path)
+        except (OSError, ValueError):
+            with self._lock: self.misses += 1
+            return None
+        with self._lock: self.hits += 1
+        return value
+
+    def has(self, namespace: str, key: str) -> bool:
+        return os.path.exists(self._path(namespace, key))
+
+    def set(self, namespace: str, key: str, value):
+        path = self._path(namespace, key); tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f: json.dump(value, f)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError, ValueError) as e:
+            app_logger.warning(f"Could not write cache entry {namespace}/{key}: {e}")
+            if os.path.exists(tmp_path): os.remove(tmp_path)
+            return
+        with self._lock:
+            self._sizes[path] = os.path.getsize(path)
+            self._evict()
+
+    def _evict(self):
+        total = sum(self._sizes.values())
+        if total <= self.max_bytes: return
+        for path in sorted(self._sizes, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0):
+            if total <= self.max_bytes: break
+            total -= self._sizes.pop(path)
+            try: os.remove(path)
+            except OSError: pass
+
+    def _path(self, namespace: str, key: str) -> str:
+        return os.path.join(self.directory, namespace, f"{key}.json")
+
+    def _entries(self):
+        for root, _, files in os.walk(self.directory):
+            for name in files:
+                if name.endswith(".json"): yield os.path.join(root, name)
@@ -0,0 +1,112 @@
+# chunking.py - Token-aware transcript chunking that prefers pauses and topic shifts as boundaries
+
+import re
+import threading
+import logging
+import numpy as np
+from retrieval import tokenize
+
+app_logger = logging.getLogger(__name__)
+SENTENCE_END = re.compile(r"[.!?…。]['\")\]]*$")
+LEXICAL_DIMENSIONS, LEXICAL_WINDOW = 256, 4
+
+_encoding, _encoding_lock = None, threading.Lock()
+
+def _get_encoding():
+    # tiktoken is optional (and fetches its vocabulary on first use); fall back to ~4 characters per token.
+    global _encoding
+    with _encoding_lock:
+        if _encoding is None:
+            try:
+                import tiktoken
+                _encoding = tiktoken.get_encoding("o200k_base")
+            except Exception as e:
+                app_logger.warning(f"tiktoken unavailable, estimating token counts: {e}")
+                _encoding = False
+    return _encoding or None
+
+def count_tokens(texts: list) -> np.ndarray:
+    encoding = _get_encoding()
+    if encoding: return np.fromiter((len(t) for t in encoding.encode_ordinary_batch(texts)), dtype=np.int64, count=len(texts))
+    return np.fromiter((len(t) // 4 + 1 for t in texts), dtype=np.int64, count=len(texts))
+
+def target_chunk_tokens(total_tokens: int, min_tokens: int, max_tokens: int, max_calls: int) -> int:
+    # Long videos get bigger chunks so the number of LLM calls stays within max_calls.
+    return int(np.clip(np.ceil(total_tokens / max(1, max_calls)), min_tokens, max_tokens))
+
+def lexical_shift(texts: list, window: int = LEXICAL_WINDOW) -> np.ndarray:
+    # For each boundary after segment i: 1 - cosine similarity of the word counts in the windows either side.
+    n = len(texts)
+    if n < 2: return np.zeros(max(0, n - 1), dtype=np.float32)
+    vocabulary, rows, cols = {}, [], []
+    for i, text in enumerate(texts):
+        for word in tokenize(text):
+            rows.append(i); cols.append(vocabulary.setdefault(word, len(vocabulary)) % LEXICAL_DIMENSIONS)
+    counts = np.zeros((n, LEXICAL_DIMENSIONS), dtype=np.float32)
+    np.add.at(counts, (np.array(rows, dtype=np.int64), np.array(cols, dtype=np.int64)), 1.0)
+    cumulative = np.vstack([np.zeros((1, LEXICAL_DIMENSIONS), dtype=np.float32), np.cumsum(counts, axis=0)])
+    idx = np.arange(1, n)
+    left = cumulative[idx] - cumulative[np.maximum(idx - window, 0)]
+    right = cumulative[np.minimum(idx + window, n)] - cumulative[idx]
+    norms = np.linalg.norm(left, axis=1) * np.linalg.norm(right, axis=1)
+    cosine = np.divide(np.einsum("ij,ij->i", left, right), norms, out=np.zeros(n - 1, dtype=np.float32), where=norms > 0)
+    return 1.0 - cosine
+
+def boundary_scores(segments: list, texts: list) -> np.ndarray:
+    # Score for cutting after segment i, in [0, 3]: pause length, sentence end and lexical shift each contribute up to 1.
+    starts = np.fromiter((s.get("start", 0) or 0 for s in segments), dtype=np.float64, count=len(segments))
+    ends = np.fromiter((s.get("end", s.get("start", 0)) or 0 for s in segments), dtype=np.float64, count=len(segments))
+    gaps = np.maximum(starts[1:] - ends[:-1], 0.0)
+    pause = np.clip(gaps / (np.percentile(gaps, 90) + 1e-6), 0.0, 1.0) if len(gaps) else gaps
+    sentence_end = np.fromiter((bool(SENTENCE_END.search(t)) for t in texts[:-1]), dtype=np.float64, count=max(0, len(texts) - 1))
+    return pause + sentence_end + lexical_shift(texts)
+
+def _make_chunk(segments: list, texts: list, tokens: np.ndarray, a: int, b: int) -> dict:
+    return {"text": " ".join(texts[a:b + 1]), "timestamp": segments[a].get("start", 0), "end": segments[b].get("end", segments[b].get("start", 0)), "tokens": int(tokens[a:b + 1].sum())}
+
+def chunk_segments(segments: list, target_tokens: int | None = None, min_tokens: int = 400, max_tokens: int = 2000, max_calls: int = 40) -> list:
+    segments = [s for s in segments if s.get("text", "").strip()]
+    if not segments: return []
+    texts = [s["text"].strip() for s in segments]
+    tokens = count_tokens(texts); cumulative = np.cumsum(tokens)
+    target = target_tokens or target_chunk_tokens(int(cumulative[-1]), min_tokens, max_tokens, max_calls)
+    scores = boundary_scores(segments, texts)
+    chunks, start = [], 0
+    while True:
+        base = int(cumulative[start - 1]) if start else 0
+        if len(segments) - start < 2 or cumulative[-1] - base <= target * 1.25: break
+        # Candidate cuts fall between 60% and 125% of the target; the best-scoring one wins, nudged toward the target.
+        lo = max(start, int(np.searchsorted(cumulative, base + target * 0.6)))
+        hi = min(len(segments) - 2, int(np.searchsorted(cumulative, base + target * 1.25, side="right")) - 1)
+        if lo > hi: lo = hi = min(max(start, hi), len(segments) - 2)
+        distance = np.abs(cumulative[lo:hi + 1] - base - target) / target
+        cut = lo + int(np.argmax(scores[lo:hi + 1] - 0.5 * distance))
+        chunks.append(_make_chunk(segments, texts, tokens, start, cut)); start = cut + 1
+    chunks.append(_make_chunk(segments, texts, tokens, start, len(segments) - 1))
+    return chunks
+
+class StreamingChunker:
+    # Incremental chunking for segments that arrive one at a time: once past 60% of the target, close at the
+    # first natural pause or sentence end; never let a chunk grow past 125% of the target.
+    def __init__(self, target_tokens: int, pause_seconds: float = 0.8):
+        self.target_tokens, self.pause_seconds = target_tokens, pause_seconds
+        self._segments, self._texts, self._tokens = [], [], []
+
+    def add(self, seg: dict) -> list:
+        text = seg.get("text", "").strip()
+        if not text: return []
+        seg_tokens, closed = int(count_tokens([text])[0]), []
+        if self._segments:
+            size, previous = sum(self._tokens), self._segments[-1]
+            natural = (seg.get("start", 0) - previous.get("end", previous.get("start", 0)) >= self.pause_seconds) or bool(SENTENCE_END.search(self._texts[-1]))
+            if (size >= self.target_tokens * 0.6 and natural) or size + seg_tokens > self.target_tokens * 1.25: closed.append(self._close())
+        self._segments.append(seg); self._texts.append(text); self._tokens.append(seg_tokens)
+        return closed
+
+    def flush(self) -> list:
+        return [self._close()] if self._segments else []
+
+    def _close(self) -> dict:
+        chunk = _make_chunk(self._segments, self._texts, np.array(self._tokens), 0, len(self._segments) - 1)
+        self._segments, self._texts, self._tokens = [], [], []
+        return chunk
@@ -0,0 +1,120 @@
+# intents.py - Local intent router for /command: compiled patterns plus a small naive Bayes classifier
+
+import hashlib
+import json
+import math
+import os
+import re
+import threading
+import logging
+from collections import Counter, defaultdict
+
+app_logger = logging.getLogger(__name__)
+
+# Labels are "<intent>" or "<intent>:<parameter value>"; the parameter name is implied by the intent.
+INTENT_PARAMETERS = {"navigate": "page", "scroll_to_section": "section"}
+INTENT_EXAMPLES = {
+    "navigate:home": ["go home", "take me home", "go to the home page", "back to home", "open the homepage", "navigate to home", "return to the main page", "go back to the start page"],
+    "navigate:faqs": ["take me to the faq page", "go to faqs", "open the faq page", "navigate to the faqs", "i want to see the faq page", "faq page please", "go to the questions page"],
+    "navigate:upload": ["go to the upload page", "take me to upload", "open the upload page", "navigate to upload", "upload page", "take me to the page where i can upload"],
+    "scroll_to_section:faq": ["scroll to faq", "scroll down to the faqs", "show me the faq section", "jump to the faqs", "scroll to the questions", "show me the frequently asked questions"],
+    "scroll_to_section:docs": ["show me the generated documentation", "scroll to the docs", "scroll to documentation", "jump to the documentation", "show me the docs section", "show me the summary", "where is the documentation"],
+    "scroll_to_section:upload": ["scroll to the upload form", "scroll up to upload", "show me the upload section", "jump to the upload form", "where is the upload form"],
+    "answer_question": ["what is this video about", "explain the main idea", "who is the speaker", "how does gradient descent work", "summarize the key points", "what did they say about training",
+                        "why is this important", "can you explain the second part", "what are the main takeaways", "tell me more about the example", "what does the speaker mean by that", "is there a conclusion",
+                        "can you go back to the part about loss functions", "go back to the first topic", "take me through the example again", "go over the second part again",
+                        "show me where they talk about gradients", "jump back to what was said about overfitting", "what happens at the start of the video", "take me back to the explanation of the model"]
+}
+PAGE_WORDS = {"home": "home", "homepage": "home", "main": "home", "start": "home", "faq": "faqs", "faqs": "faqs", "questions": "faqs", "upload": "upload"}
+SECTION_WORDS = {"faq": "faq", "faqs": "faq", "questions": "faq", "docs": "docs", "documentation": "docs", "summary": "docs", "upload": "upload"}
+# "main" and "start" are left out here: "the start of the video" is not the home page (the patterns handle "main page").
+LABEL_WORDS = {"navigate": {k: v for k, v in PAGE_WORDS.items() if k not in ("main", "start")}, "scroll_to_section": SECTION_WORDS}
+NAVIGATE_PATTERN = re.compile(r"^(?:please\s+)?(?:go|take me|navigate|bring me|head|switch|return)\s+(?:back\s+)?(?:to\s+)?(?:the\s+)?(home|homepage|main|start|faqs?|upload)(?:\s+page)?\s*(?:please)?[.!]?$")
+SCROLL_PATTERN = re.compile(r"^(?:please\s+)?(?:scroll|jump|move)\s+(?:down\s+|up\s+)?to\s+(?:the\s+)?(faqs?|questions|docs|documentation|summary|upload)(?:\s+(?:section|form))?\s*(?:please)?[.!]?$")
+WORD_PATTERN = re.compile(r"[a-z']+")
+
+def features(text: str) -> list:
+    words = WORD_PATTERN.findall(text.lower())
+    return words + [f"{a}_{b}" for a, b in zip(words, words[1:])]
+
+def examples_fingerprint(examples: dict) -> str:
+    return hashlib.sha256(json.dumps(examples, sort_keys=True).encode("utf-8")).hexdigest()
+
+class NaiveBayesIntentClassifier:
+    def __init__(self, log_priors: dict, log_likelihoods: dict, unseen: dict, fingerprint: str = ""):
+        self.log_priors, self.log_likelihoods, self.unseen, self.fingerprint = log_priors, log_likelihoods, unseen, fingerprint
+
+    @classmethod
+    def train(cls, examples: dict, alpha: float = 0.5) -> "NaiveBayesIntentClassifier":
+        counts, vocabulary = {}, set()
+        for label, texts in examples.items():
+            counts[label] = Counter(f for t in texts for f in features(t)); vocabulary |= set(counts[label])
+        total_examples = sum(len(t) for t in examples.values())
+        log_priors = {label: math.log(len(texts) / total_examples) for label, texts in examples.items()}
+        log_likelihoods, unseen = {}, {}
+        for label, c in counts.items():
+            denominator = sum(c.values()) + alpha * (len(vocabulary) + 1)
+            log_likelihoods[label] = {f: math.log((n + alpha) / denominator) for f, n in c.items()}
+            unseen[label] = math.log(alpha / denominator)
+        return cls(log_priors, log_likelihoods, unseen, examples_fingerprint(examples))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        feats = features(text)
+        scores = {label: prior + sum(self.log_likelihoods[label].get(f, self.unseen[label]) for f in feats) for label, prior in self.log_priors.items()}
+        best = max(scores, key=scores.get); top = scores[best]
+        return best, 1.0 / sum(math.exp(s - top) for s in scores.values())
+
+    def save(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"fingerprint": self.fingerprint, "log_priors": self.log_priors, "log_likelihoods": self.log_likelihoods, "unseen": self.unseen}, f)
+
+    @classmethod
+    def load_or_train(cls, path: str | None, examples: dict) -> "NaiveBayesIntentClassifier":
+        fingerprint = examples_fingerprint(examples)
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f: data = json.load(f)
+                if data.get("fingerprint") == fingerprint: return cls(data["log_priors"], data["log_likelihoods"], data["unseen"], fingerprint)
+            except (OSError, ValueError, KeyError) as e:
+                app_logger.warning(f"Could not load intent model from {path}, retraining: {e}")
+        classifier = cls.train(examples)
+        if path:
+            try: classifier.save(path)
+            except OSError as e: app_logger.warning(f"Could not save intent model to {path}: {e}")
+        return classifier
+
+def to_command(label: str) -> dict:
+    intent, _, value = label.partition(":")
+    return {"intent": intent, "parameters": {INTENT_PARAMETERS[intent]: value} if value else {}}
+
+def names_target(label: str, text: str) -> bool:
+    # The classifier has no out-of-domain class, so "go back to the part about X" can look like navigation.
+    # A navigate/scroll label is only trusted when the text names that page or section.
+    intent, _, value = label.partition(":")
+    if intent not in LABEL_WORDS: return True
+    return any(LABEL_WORDS[intent].get(word) == value for word in WORD_PATTERN.findall(text))
+
+class IntentRouter:
+    # route() returns a command dict when it is confident enough, or None to fall back to the LLM.
+    def __init__(self, classifier: NaiveBayesIntentClassifier, threshold: float = 0.8):
+        self.classifier, self.threshold = classifier, threshold
+        self._lock = threading.Lock()
+        self.counts = defaultdict(int)
+
+    def route(self, text: str) -> dict | None:
+        normalized = " ".join(text.lower().split())
+        if match := NAVIGATE_PATTERN.match(normalized): return self._hit("pattern", to_command(f"navigate:{PAGE_WORDS[match.group(1)]}"), 1.0)
+        if match := SCROLL_PATTERN.match(normalized): return self._hit("pattern", to_command(f"scroll_to_section:{SECTION_WORDS[match.group(1)]}"), 1.0)
+        label, confidence = self.classifier.predict(normalized)
+        if confidence >= self.threshold and names_target(label, normalized): return self._hit("classifier", to_command(label), confidence)
+        with self._lock: self.counts["fallback"] += 1
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self.counts); total = sum(counts.values())
+        return {**counts, "hit_rate": round((total - counts.get("fallback", 0)) / total, 4) if total else 0.0}
+
+    def _hit(self, source: str, command: dict, confidence: float) -> dict:
+        with self._lock: self.counts[source] += 1
+        return {**command, "confidence": round(confidence, 4), "source": source}
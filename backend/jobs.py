@@ -0,0 +1,114 @@
+# jobs.py - Background job pipeline for long-running /upload work
+
+import threading
+import time
+import uuid
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+app_logger = logging.getLogger(__name__)
+
+class QueueFullError(RuntimeError):
+    pass
+
+class Job:
+    def __init__(self, job_id: str):
+        self.id = job_id
+        self.status = "queued"  # queued -> running -> done | failed
+        self.stage = "queued"
+        self.progress = {"done": 0, "total": 0}
+        self.result, self.error = None, None
+        self.created_at = self.updated_at = time.time()
+        self.finished_at = None
+        self.events: list[tuple[str, dict]] = []
+        self.timings: dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._event_added = threading.Condition(self._lock)
+
+    def set_stage(self, stage: str, total: int = 0, done: int = 0):
+        with self._lock:
+            self.stage = stage; self.progress = {"done": done, "total": total}; self.updated_at = time.time()
+            self._publish("stage", {"stage": stage, "progress": dict(self.progress)})
+        app_logger.info(f"Job {self.id}: {stage}")
+
+    def advance(self, done: int = 1):
+        with self._lock:
+            self.progress["done"] += done; self.updated_at = time.time()
+            self._publish("progress", {"stage": self.stage, "progress": dict(self.progress)})
+
+    def publish(self, event: str, data: dict):
+        with self._lock: self._publish(event, data)
+
+    def finish(self, result: dict | None = None, error: str | None = None):
+        with self._lock:
+            self.result, self.error = result, error
+            self.status = "failed" if error is not None else "done"
+            self.stage = self.status; self.finished_at = self.updated_at = time.time()
+            self._publish(self.status, {"error": error} if error is not None else {})
+
+    def iter_events(self, start: int = 0, heartbeat_seconds: float = 15.0):
+        # Yields (index, event, data); (index, None, None) is a heartbeat while nothing new has arrived.
+        index = start
+        while True:
+            with self._lock:
+                if index >= len(self.events) and self.finished_at is None: self._event_added.wait(heartbeat_seconds)
+                pending, finished = self.events[index:], self.finished_at is not None
+            for event, data in pending:
+                yield index, event, data; index += 1
+            if finished and index >= len(self.events): return
+            if not pending: yield index, None, None
+
+    def _publish(self, event: str, data: dict):
+        self.events.append((event, data)); self._event_added.notify_all()
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.id, "status": self.status, "stage": self.stage, "progress": dict(self.progress),
+                "error": self.error, "created_at": self.created_at, "updated_at": self.updated_at
+            }
+
+class JobManager:
+    def __init__(self, max_workers: int = 2, max_pending: int = 32, retention_seconds: int = 3600):
+        self.max_pending, self.retention_seconds = max_pending, retention_seconds
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._jobs: dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def submit(self, fn, *args, **kwargs) -> Job:
+        with self._lock:
+            self._check_capacity()
+            job = Job(uuid.uuid4().hex); self._jobs[job.id] = job
+        self._executor.submit(self._run, job, fn, args, kwargs)
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = {"queued": 0, "running": 0, "done": 0, "failed": 0}
+            for job in self._jobs.values(): counts[job.status] += 1
+            return counts
+
+    def ensure_capacity(self):
+        # Lets callers fail fast before expensive request handling; submit() checks again.
+        with self._lock: self._check_capacity()
+
+    def _check_capacity(self):
+        self._prune()
+        pending = sum(1 for j in self._jobs.values() if j.status in ("queued", "running"))
+        if pending >= self.max_pending: raise QueueFullError("Too many videos are being processed. Please try again shortly.")
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock: return self._jobs.get(job_id)
+
+    def _run(self, job: Job, fn, args, kwargs):
+        job.status = "running"
+        try:
+            job.finish(result=fn(job, *args, **kwargs))
+        except Exception as e:
+            app_logger.error(f"Job {job.id} failed: {e}", exc_info=True)
+            job.finish(error=str(e))
+
+    def _prune(self):
+        cutoff = time.time() - self.retention_seconds
+        for job_id in [j.id for j in self._jobs.values() if j.finished_at and j.finished_at < cutoff]:
+            del self._jobs[job_id]
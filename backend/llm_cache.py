@@ -0,0 +1,68 @@
+# llm_cache.py - Memoization of chat completion responses: in-process LRU with an optional SQLite tier
+
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+def make_llm_key(model_name: str, system_message: str, user_prompt: str, max_tokens: int, temperature: float, json_mode: bool) -> str:
+    payload = json.dumps([model_name, system_message, user_prompt, max_tokens, temperature, json_mode])
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class SQLiteResponseStore:
+    def __init__(self, path: str, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, value TEXT NOT NULL, expires_at REAL NOT NULL)")
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            row = self._conn.execute("SELECT value, expires_at FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and row[1] < time.time():
+                with self._conn: self._conn.execute("DELETE FROM responses WHERE key = ?", (key,))
+                return None
+        return row[0] if row else None
+
+    def set(self, key: str, value: str):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT OR REPLACE INTO responses (key, value, expires_at) VALUES (?, ?, ?)", (key, value, time.time() + self.ttl_seconds))
+
+    def purge_expired(self):
+        with self._lock, self._conn: self._conn.execute("DELETE FROM responses WHERE expires_at < ?", (time.time(),))
+
+class LLMResponseCache:
+    def __init__(self, max_entries: int = 1024, disk_store: SQLiteResponseStore | None = None):
+        self.max_entries, self.disk_store = max_entries, disk_store
+        self._memory: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+        self.memory_hits = self.disk_hits = self.misses = 0
+
+    def get(self, key: str) -> str | None:
+        with self._lock:
+            if key in self._memory:
+                self._memory.move_to_end(key); self.memory_hits += 1
+                return self._memory[key]
+        value = self.disk_store.get(key) if self.disk_store else None
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self.disk_hits += 1; self._remember(key, value)
+        return value
+
+    def set(self, key: str, value: str):
+        with self._lock: self._remember(key, value)
+        if self.disk_store: self.disk_store.set(key, value)
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"memory_hits": self.memory_hits, "disk_hits": self.disk_hits, "misses": self.misses, "memory_entries": len(self._memory)}
+
+    def _remember(self, key: str, value: str):
+        self._memory[key] = value; self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries: self._memory.popitem(last=False)
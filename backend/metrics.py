@@ -0,0 +1,109 @@
+# metrics.py - Minimal Prometheus-style metrics (counters, histograms, callback gauges) and stage timers
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1800)
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _format_labels(labelnames: tuple, values: tuple, extra: str = "") -> str:
+    pairs = [f'{k}="{_escape(v)}"' for k, v in zip(labelnames, values)]
+    if extra: pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _format_value(value: float) -> str:
+    return "+Inf" if value == math.inf else repr(float(value))
+
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = ()):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self._values: dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock: self._values[key] = self._values.get(key, 0.0) + amount
+
+    def samples(self):
+        with self._lock: return [(self.name, _format_labels(self.labelnames, k), v) for k, v in sorted(self._values.items())]
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple = (), buckets: tuple = DEFAULT_BUCKETS):
+        self.name, self.documentation, self.labelnames = name, documentation, labelnames
+        self.buckets = tuple(buckets) + (math.inf,)
+        self._values: dict[tuple, list] = {}  # key -> [bucket counts..., sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(labels.get(n, "") for n in self.labelnames)
+        with self._lock:
+            state = self._values.setdefault(key, [0] * len(self.buckets) + [0.0])
+            for i, bound in enumerate(self.buckets):
+                if value <= bound: state[i] += 1
+            state[-1] += value
+
+    def samples(self):
+        out = []
+        with self._lock:
+            for key, state in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, state):
+                    out.append((f"{self.name}_bucket", _format_labels(self.labelnames, key, f'le="{_format_value(bound)}"'), count))
+                out.append((f"{self.name}_sum", _format_labels(self.labelnames, key), state[-1]))
+                out.append((f"{self.name}_count", _format_labels(self.labelnames, key), state[-2]))
+        return out
+
+class CallbackMetric:
+    # Reads its values at scrape time, e.g. from a cache's or scheduler's own stats(); callback returns {label_value: number},
+    # or {(value, value, ...): number} when labelname is a tuple of names.
+    def __init__(self, name: str, documentation: str, kind: str, labelname: str | tuple | None, callback):
+        self.name, self.documentation, self.kind, self.labelname, self.callback = name, documentation, kind, labelname, callback
+
+    def samples(self):
+        values = self.callback() or {}
+        if self.labelname is None: return [(self.name, "", values)] if not isinstance(values, dict) else []
+        if isinstance(self.labelname, tuple): return [(self.name, _format_labels(self.labelname, k), v) for k, v in sorted(values.items())]
+        return [(self.name, _format_labels((self.labelname,), (k,)), v) for k, v in sorted(values.items())]
+
+class Registry:
+    def __init__(self):
+        self._metrics, self._lock = [], threading.Lock()
+
+    def register(self, metric):
+        with self._lock: self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter: return self.register(Counter(*args, **kwargs))
+    def histogram(self, *args, **kwargs) -> Histogram: return self.register(Histogram(*args, **kwargs))
+    def callback(self, *args, **kwargs) -> CallbackMetric: return self.register(CallbackMetric(*args, **kwargs))
+
+    def render(self) -> str:
+        lines = []
+        with self._lock: metrics = list(self._metrics)
+        for metric in metrics:
+            try: samples = metric.samples()
+            except Exception: continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_format_value(value)}" for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+@contextmanager
+def timed(histogram: Histogram, timings: dict | None = None, **labels):
+    # Observes the block's wall time; also accumulates it into timings[label value] for per-request breakdowns.
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        histogram.observe(elapsed, **labels)
+        if timings is not None:
+            name = "/".join(str(v) for v in labels.values()) or histogram.name
+            timings[name] = round(timings.get(name, 0.0) + elapsed, 4)
@@ -0,0 +1,86 @@
+# models.py - Registry of transcription models warmed up in the background and picked per request
+
+import threading
+import time
+import logging
+
+app_logger = logging.getLogger(__name__)
+
+def parse_mapping(value: str) -> dict:
+    # "en=base,de=small" -> {"en": "base", "de": "small"}
+    pairs = (item.split("=", 1) for item in value.split(",") if "=" in item)
+    return {k.strip(): v.strip() for k, v in pairs if k.strip() and v.strip()}
+
+class LoadedModel:
+    __slots__ = ("name", "compute_type", "device", "model", "batch_scheduler", "sharded_transcriber")
+
+    def __init__(self, name: str, compute_type: str, device: str, model, batch_scheduler=None, sharded_transcriber=None):
+        self.name, self.compute_type, self.device, self.model = name, compute_type, device, model
+        self.batch_scheduler, self.sharded_transcriber = batch_scheduler, sharded_transcriber
+
+class ModelRegistry:
+    # loader(name) -> LoadedModel runs on a background thread, default model first, so the app serves (and
+    # reports not-ready) while weights load. Failed loads are retried every retry_seconds.
+    def __init__(self, names: list, loader, default: str | None = None, by_language: dict | None = None,
+                 long_audio_model: str | None = None, long_audio_seconds: float = 0.0, retry_seconds: float = 30.0):
+        self.names = list(dict.fromkeys(names + [n for n in [default, long_audio_model, *(by_language or {}).values()] if n]))
+        self.default = default or self.names[0]
+        self.loader, self.by_language, self.retry_seconds = loader, by_language or {}, retry_seconds
+        self.long_audio_model, self.long_audio_seconds = long_audio_model, long_audio_seconds
+        self._models: dict[str, LoadedModel] = {}
+        self._status, self._errors = {n: "pending" for n in self.names}, {}
+        self._ready, self._lock = threading.Event(), threading.Lock()
+
+    def start(self) -> "ModelRegistry":
+        threading.Thread(target=self._load_all, name="model-loader", daemon=True).start()
+        return self
+
+    def is_ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: float | None = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def select(self, language: str, duration_seconds: float | None = None) -> LoadedModel | None:
+        # Long recordings go to long_audio_model, otherwise the language's model, otherwise the default;
+        # a choice that is not loaded yet falls through to the next, then to whatever is ready.
+        preferred = [self.by_language.get(language), self.default]
+        if self.long_audio_model and duration_seconds is not None and duration_seconds >= self.long_audio_seconds: preferred.insert(0, self.long_audio_model)
+        with self._lock:
+            for name in preferred:
+                if name in self._models: return self._models[name]
+            return next(iter(self._models.values()), None)
+
+    def candidates(self, language: str) -> list:
+        # Every loaded model select() could currently pick for this language, whatever the duration.
+        chosen = [self.select(language), self.select(language, float("inf"))]
+        return list({m.name: m for m in chosen if m}.values())
+
+    def loaded(self) -> list:
+        with self._lock: return list(self._models.values())
+
+    def status(self) -> dict:
+        with self._lock:
+            models = {n: {"status": s, **({"compute_type": self._models[n].compute_type, "device": self._models[n].device} if n in self._models else {}),
+                          **({"error": self._errors[n]} if n in self._errors else {})} for n, s in self._status.items()}
+        return {"ready": self.is_ready(), "default": self.default, "models": models}
+
+    def _load_all(self):
+        pending = sorted(self.names, key=lambda n: n != self.default)
+        while pending:
+            failed = []
+            for name in pending:
+                with self._lock: self._status[name] = "loading"
+                started = time.perf_counter()
+                try:
+                    loaded = self.loader(name)
+                except Exception as e:
+                    app_logger.error(f"Could not load transcription model {name}: {e}")
+                    with self._lock: self._status[name] = "failed"; self._errors[name] = str(e)
+                    failed.append(name); continue
+                with self._lock:
+                    self._models[name] = loaded; self._status[name] = "ready"; self._errors.pop(name, None)
+                self._ready.set()
+                app_logger.info(f"Transcription model {name} ({loaded.compute_type} on {loaded.device}) ready in {time.perf_counter() - started:.1f}s.")
+            pending = failed
+            if pending: time.sleep(self.retry_seconds)
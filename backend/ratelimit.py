@@ -0,0 +1,37 @@
+# ratelimit.py - Token bucket limiter and retry-with-backoff for outbound API calls
+
+import random
+import threading
+import time
+
+class TokenBucket:
+    def __init__(self, rate_per_second: float, capacity: float):
+        self.rate, self.capacity = rate_per_second, capacity
+        self._tokens, self._last = capacity, time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, tokens: float = 1.0):
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._last) * self.rate); self._last = now
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                wait = (tokens - self._tokens) / self.rate
+            time.sleep(wait)
+
+def retry_with_backoff(fn, is_retryable, max_attempts: int = 5, base_delay: float = 1.0, max_delay: float = 30.0):
+    for attempt in range(1, max_attempts + 1):
+        try:
+            return fn()
+        except Exception as e:
+            if attempt == max_attempts or not is_retryable(e): raise
+            delay = retry_after_seconds(e)
+            if delay is None: delay = random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))  # full jitter
+            time.sleep(min(delay, max_delay))
+
+def retry_after_seconds(exc: Exception) -> float | None:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try: return float(headers.get("retry-after"))
+    except (TypeError, ValueError): return None
@@ -0,0 +1,74 @@
+# retrieval.py - Per-video retrieval index (BM25, optionally blended with local embeddings) for /ask
+
+import math
+import re
+import threading
+import logging
+from collections import Counter
+
+app_logger = logging.getLogger(__name__)
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset("a an and are as at be but by do does for from has have how i in is it its of on or so that the this to was what when where which who why will with you your".split())
+
+def tokenize(text: str) -> list:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+_embedder, _embedder_lock = None, threading.Lock()
+
+def get_embedder(model_name: str | None):
+    # sentence-transformers is optional; without it the index is BM25 only.
+    global _embedder
+    if not model_name: return None
+    with _embedder_lock:
+        if _embedder is None:
+            try:
+                from sentence_transformers import SentenceTransformer
+                _embedder = SentenceTransformer(model_name, device="cpu")
+            except Exception as e:
+                app_logger.warning(f"Embeddings disabled, could not load {model_name}: {e}")
+                _embedder = False
+    return _embedder or None
+
+class TranscriptIndex:
+    def __init__(self, chunks: list, k1: float = 1.5, b: float = 0.75, embeddings: list | None = None, embedding_model: str | None = None):
+        self.chunks, self.k1, self.b, self.embeddings, self.embedding_model = chunks, k1, b, embeddings, embedding_model
+        self._term_freqs = [Counter(tokenize(c["text"])) for c in chunks]
+        self._lengths = [sum(tf.values()) for tf in self._term_freqs]
+        self._avg_length = (sum(self._lengths) / len(self._lengths)) if self._lengths else 0.0
+        doc_freqs = Counter(term for tf in self._term_freqs for term in tf)
+        n = len(chunks)
+        self._idf = {term: math.log(1 + (n - df + 0.5) / (df + 0.5)) for term, df in doc_freqs.items()}
+
+    @classmethod
+    def build(cls, chunks: list, embedding_model: str | None = None) -> "TranscriptIndex":
+        embedder, embeddings = get_embedder(embedding_model), None
+        if embedder and chunks:
+            vectors = embedder.encode([c["text"] for c in chunks], normalize_embeddings=True)
+            embeddings = [[round(float(x), 5) for x in v] for v in vectors]
+        return cls(chunks, embeddings=embeddings, embedding_model=embedding_model if embeddings else None)
+
+    def bm25_scores(self, query: str) -> list:
+        terms, scores = tokenize(query), []
+        for tf, length in zip(self._term_freqs, self._lengths):
+            norm = self.k1 * (1 - self.b + self.b * length / self._avg_length) if self._avg_length else self.k1
+            scores.append(sum(self._idf[t] * tf[t] * (self.k1 + 1) / (tf[t] + norm) for t in terms if t in tf))
+        return scores
+
+    def search(self, query: str, top_k: int = 4, embedding_model: str | None = None, embedding_weight: float = 0.5) -> list:
+        scores = self.bm25_scores(query)
+        # Vectors from a different embedding model are not comparable, so such an index falls back to BM25 only.
+        embedder = get_embedder(embedding_model) if self.embeddings and embedding_model == self.embedding_model else None
+        if embedder:
+            top = max(scores) or 1.0
+            q = embedder.encode([query], normalize_embeddings=True)[0]
+            cosines = [sum(a * b for a, b in zip(q, v)) for v in self.embeddings]
+            scores = [(1 - embedding_weight) * s / top + embedding_weight * c for s, c in zip(scores, cosines)]
+        ranked = sorted(range(len(scores)), key=lambda i: scores[i], reverse=True)
+        return [{**self.chunks[i], "score": round(scores[i], 4)} for i in ranked[:top_k] if scores[i] > 0]
+
+    def to_dict(self) -> dict:
+        return {"chunks": self.chunks, "k1": self.k1, "b": self.b, "embeddings": self.embeddings, "embedding_model": self.embedding_model}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "TranscriptIndex":
+        return cls(data["chunks"], k1=data.get("k1", 1.5), b=data.get("b", 0.75), embeddings=data.get("embeddings"), embedding_model=data.get("embedding_model"))
@@ -0,0 +1,53 @@
+# sharding.py - Parallel transcription of long audio across a pool of warm worker processes
+
+import os
+import multiprocessing
+import logging
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from audio import SAMPLE_RATE
+
+app_logger = logging.getLogger(__name__)
+_worker_model = None
+
+def offset_segments(segments: list, offset: float) -> list:
+    if not offset: return list(segments)
+    return [{**s, "start": s.get("start", 0) + offset, "end": s.get("end", 0) + offset} for s in segments]
+
+def _init_worker(model_name: str, compute_type: str, threads: int):
+    global _worker_model
+    import torch
+    import whisperx
+    torch.set_num_threads(threads)
+    _worker_model = whisperx.load_model(model_name, "cpu", compute_type=compute_type)
+
+def _ping(_=None) -> int:
+    return os.getpid()
+
+def _transcribe_shard(audio: np.ndarray, language: str, offset: float) -> list:
+    return offset_segments(_worker_model.transcribe(audio, language=language).get("segments", []), offset)
+
+class ShardedTranscriber:
+    # Each worker process loads its own model once and keeps it for the life of the pool.
+    def __init__(self, model_name: str, compute_type: str, workers: int):
+        self.workers = workers
+        threads = max(1, (os.cpu_count() or 1) // workers)
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"),
+                                         initializer=_init_worker, initargs=(model_name, compute_type, threads))
+        try:
+            pids = set(self._pool.map(_ping, range(workers)))  # starts every worker and surfaces model load errors now
+        except Exception:
+            self._pool.shutdown(cancel_futures=True)
+            raise
+        app_logger.info(f"Sharded transcription ready: {len(pids)} worker processes, {threads} threads each.")
+
+    def map(self, audio: np.ndarray, language: str, bounds: list):
+        # Yields each shard's segments in order, already shifted onto the full recording's timeline.
+        futures = [self._pool.submit(_transcribe_shard, np.array(audio[a:b]), language, a / SAMPLE_RATE) for a, b in bounds]
+        try:
+            for future in futures: yield future.result()
+        finally:
+            for future in futures: future.cancel()
+
+    def shutdown(self):
+        self._pool.shutdown(cancel_futures=True)
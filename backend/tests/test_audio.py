@@ -0,0 +1,20 @@
+# test_audio.py - Window and shard boundaries never exceed their caps and always tile the recording
+
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio import SAMPLE_RATE, silence_windows
+
+def test_silence_windows_respect_the_cap_in_samples():
+    rng = np.random.default_rng(0)
+    cap = 30 * SAMPLE_RATE
+    # Lengths that leave a partial frame after the last whole 30 ms frame, e.g. 30 s + 444 samples.
+    for length in (cap + 444, 2 * cap + 1, 3 * cap - 1, 95 * SAMPLE_RATE + 123, cap, 10):
+        audio = rng.standard_normal(length).astype(np.float32) * 0.1
+        windows = silence_windows(audio, 30.0)
+        assert all(b - a <= cap for a, b in windows), (length, windows)
+        assert windows[0][0] == 0 and windows[-1][1] == length
+        assert all(b1 == a2 for (_, b1), (a2, _) in zip(windows, windows[1:]))
@@ -0,0 +1,31 @@
+# test_intents.py - The local /command router handles plain navigation and leaves questions about the video alone
+
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intents import INTENT_EXAMPLES, IntentRouter, NaiveBayesIntentClassifier
+
+@pytest.fixture(scope="module")
+def router():
+    return IntentRouter(NaiveBayesIntentClassifier.train(INTENT_EXAMPLES))
+
+@pytest.mark.parametrize("text", [
+    "can you go back to the part about loss functions", "go back to the first topic", "go back to the start of the video",
+    "take me to the section where he explains backpropagation", "show me the example with the cat pictures", "jump to the conclusion",
+])
+def test_questions_about_the_video_are_not_navigation(router, text):
+    routed = router.route(text)
+    assert routed is None or routed["intent"] == "answer_question", routed
+
+@pytest.mark.parametrize("text, intent, parameters", [
+    ("go home", "navigate", {"page": "home"}), ("return to the main page", "navigate", {"page": "home"}),
+    ("take me to the faq page", "navigate", {"page": "faqs"}), ("open the upload page", "navigate", {"page": "upload"}),
+    ("scroll to the documentation", "scroll_to_section", {"section": "docs"}), ("show me the faq section", "scroll_to_section", {"section": "faq"}),
+    ("could you show me the docs", "scroll_to_section", {"section": "docs"}), ("what is this video about?", "answer_question", {}),
+])
+def test_commands_are_routed_locally(router, text, intent, parameters):
+    routed = router.route(text)
+    assert routed and (routed["intent"], routed["parameters"]) == (intent, parameters), routed
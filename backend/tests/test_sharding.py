@@ -0,0 +1,44 @@
+# test_sharding.py - Builds a real spawn pool against a stub whisperx and checks shard offsets are merged correctly
+
+import importlib.util
+import os
+import sys
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from audio import SAMPLE_RATE
+from sharding import ShardedTranscriber, offset_segments
+
+STUB_WHISPERX = '''
+class _Model:
+    def transcribe(self, audio, language=None, **kwargs):
+        seconds = len(audio) / 16000
+        return {"segments": [{"text": "first", "start": 0.0, "end": seconds / 2}, {"text": "second", "start": seconds / 2, "end": seconds}]}
+
+def load_model(*args, **kwargs):
+    return _Model()
+'''
+STUB_TORCH = "def set_num_threads(n):\n    pass\n"
+
+def install_stubs(directory):
+    # Written to disk rather than sys.modules so the spawned workers (which inherit sys.path) import them too.
+    with open(os.path.join(directory, "whisperx.py"), "w") as f: f.write(STUB_WHISPERX)
+    if importlib.util.find_spec("torch") is None:
+        with open(os.path.join(directory, "torch.py"), "w") as f: f.write(STUB_TORCH)
+    sys.path.insert(0, str(directory)); sys.modules.pop("whisperx", None)
+
+def test_sharded_segments_are_offset_onto_the_full_timeline(tmp_path):
+    install_stubs(tmp_path)
+    import whisperx
+    audio = np.zeros(SAMPLE_RATE * 9, dtype=np.float32)
+    bounds = [(0, SAMPLE_RATE * 2), (SAMPLE_RATE * 2, SAMPLE_RATE * 5), (SAMPLE_RATE * 5, SAMPLE_RATE * 9)]
+    transcriber = ShardedTranscriber("base", "int8", workers=2)
+    try:
+        sharded = [seg for shard in transcriber.map(audio, "en", bounds) for seg in shard]
+    finally:
+        transcriber.shutdown()
+    model = whisperx.load_model("base", "cpu")
+    single = [seg for a, b in bounds for seg in offset_segments(model.transcribe(audio[a:b])["segments"], a / SAMPLE_RATE)]
+    assert sharded == single
+    assert [(s["start"], s["end"]) for s in sharded] == [(0.0, 1.0), (1.0, 2.0), (2.0, 3.5), (3.5, 5.0), (5.0, 7.0), (7.0, 9.0)]
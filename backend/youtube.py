@@ -0,0 +1,102 @@
+# youtube.py - Audio-only YouTube downloads into a size-capped, resumable cache keyed by video ID
+
+import json
+import os
+import threading
+import logging
+from collections import defaultdict
+from contextlib import contextmanager
+import yt_dlp
+
+app_logger = logging.getLogger(__name__)
+
+class YouTubeDownloadCache:
+    # Files live at <directory>/<video_id>.<ext> with a <video_id>.json sidecar; yt_dlp's .part/.ytdl files sit
+    # alongside, so an interrupted download resumes on the next request. mtime doubles as the LRU clock.
+    def __init__(self, directory: str, max_bytes: int, audio_only: bool = True, concurrent_fragments: int = 4):
+        self.directory, self.max_bytes, self.audio_only, self.concurrent_fragments = directory, max_bytes, audio_only, concurrent_fragments
+        self.hits = self.misses = 0
+        self._lock = threading.Lock()
+        self._flights: dict[str, tuple] = {}  # key -> (lock, waiters); one download per video at a time
+        self._pins = defaultdict(int)  # video_id -> jobs still reading the file
+        os.makedirs(directory, exist_ok=True)
+
+    def ydl_options(self) -> dict:
+        return {
+            'outtmpl': os.path.join(self.directory, '%(id)s.%(ext)s'), 'format': 'bestaudio/best' if self.audio_only else 'best[ext=mp4]/best',
+            'concurrent_fragment_downloads': self.concurrent_fragments, 'continuedl': True, 'retries': 10, 'fragment_retries': 10,
+            'quiet': True, 'noprogress': True
+        }
+
+    @contextmanager
+    def fetch(self, url: str, video_id: str | None = None):
+        # Yields (path, title); the file is protected from eviction until the block exits.
+        with self._single_flight(video_id or url):
+            entry = self._lookup(video_id) if video_id else None
+            with self._lock:
+                if entry: self.hits += 1
+                else: self.misses += 1
+            if entry is None: entry = self._download(url)
+            path, title, video_id = entry
+            with self._lock: self._pins[video_id] += 1
+        try:
+            yield path, title
+        finally:
+            with self._lock:
+                self._pins[video_id] -= 1
+                if not self._pins[video_id]: del self._pins[video_id]
+            self._evict()
+
+    def stats(self) -> dict:
+        with self._lock: return {"hit": self.hits, "miss": self.misses}
+
+    def _lookup(self, video_id: str) -> tuple | None:
+        sidecar = os.path.join(self.directory, f"{video_id}.json")
+        try:
+            with open(sidecar, "r", encoding="utf-8") as f: meta = json.load(f)
+            path = os.path.join(self.directory, meta["filename"])
+            os.utime(path); os.utime(sidecar)
+        except (OSError, ValueError, KeyError):
+            return None
+        return path, meta.get("title", "youtube_video"), video_id
+
+    def _download(self, url: str) -> tuple:
+        with yt_dlp.YoutubeDL(self.ydl_options()) as ydl:
+            info = ydl.extract_info(url, download=True)
+        path, video_id, title = info['requested_downloads'][0]['filepath'], info['id'], info.get('title', 'youtube_video')
+        with open(os.path.join(self.directory, f"{video_id}.json"), "w", encoding="utf-8") as f:
+            json.dump({"filename": os.path.basename(path), "title": title}, f)
+        app_logger.info(f"Downloaded {video_id} ({os.path.getsize(path) / 1024 / 1024:.1f} MB)")
+        return path, title, video_id
+
+    @contextmanager
+    def _single_flight(self, key: str):
+        with self._lock:
+            lock, waiters = self._flights.get(key, (threading.Lock(), 0)); self._flights[key] = (lock, waiters + 1)
+        try:
+            with lock: yield
+        finally:
+            with self._lock:
+                lock, waiters = self._flights[key]
+                if waiters == 1: del self._flights[key]
+                else: self._flights[key] = (lock, waiters - 1)
+
+    def _evict(self):
+        # Evicts whole videos (media, sidecar and partial files), oldest first, skipping any in use or mid-download.
+        groups = defaultdict(lambda: [0, 0.0, []])
+        for name in os.listdir(self.directory):
+            path = os.path.join(self.directory, name)
+            try: stat = os.stat(path)
+            except OSError: continue
+            group = groups[name.split(".", 1)[0]]
+            group[0] += stat.st_size; group[1] = max(group[1], stat.st_mtime); group[2].append(path)
+        total = sum(g[0] for g in groups.values())
+        if total <= self.max_bytes: return
+        with self._lock: busy = set(self._pins) | set(self._flights)
+        for video_id, (size, _, paths) in sorted(groups.items(), key=lambda item: item[1][1]):
+            if total <= self.max_bytes: break
+            if video_id in busy: continue
+            for path in paths:
+                try: os.remove(path)
+                except OSError: pass
+            total -= size
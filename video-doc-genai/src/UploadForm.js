@@ -13,11 +13,13 @@ function UploadForm() {
   const [videoFile, setVideoFile] = useState(null);
   const [language, setLanguage] = useState('en');
   const [loading, setLoading] = useState(false);
+  const [jobStage, setJobStage] = useState("");
   const [errorMessage, setErrorMessage] = useState("");
   const [videoTitle, setVideoTitle] = useState("");
   const [currentVideoId, setCurrentVideoId] = useState(null);
   const [videoPlaybackUrl, setVideoPlaybackUrl] = useState(null);
   const [videoDownloadUrl, setVideoDownloadUrl] = useState(null);
+  const [indexId, setIndexId] = useState(null);
 
   // --- Refs for Scrolling ---
   const uploadFormRef = useRef(null);
@@ -59,22 +61,27 @@ function UploadForm() {
     setCurrentVideoId(null);
     setVideoPlaybackUrl(null);
     setVideoDownloadUrl(null);
+    setIndexId(null);
     setVideoTitle("");
+    setJobStage("");
 
     const formData = new FormData();
     if (currentUrl) formData.append("video_url", currentUrl);
     else if (videoFile) formData.append("video", videoFile);
     formData.append("language", language);
+    formData.append("stream", "true");
 
     try {
       const res = await fetch("http://localhost:5000/upload", { method: "POST", body: formData });
-      const data = await res.json();
-      if (!res.ok) throw new Error(data.error || "Server error");
+      const job = await res.json();
+      if (!res.ok) throw new Error(job.error || "Server error");
+      const data = await waitForJob(job.job_id);
       
       setTranscriptSegments(data.full_transcript_segments || []);
       setDocumentationSections(data.documentation || []);
       setFaqs(data.faqs || []);
       setVideoTitle(data.video_title || "video_analysis");
+      setIndexId(data.index_id || null);
       if (data.video_id) setCurrentVideoId(data.video_id);
       if (data.video_playback_url) setVideoPlaybackUrl(`http://localhost:5000${data.video_playback_url}`);
       if (data.video_download_url) setVideoDownloadUrl(`http://localhost:5000${data.video_download_url}`);
@@ -85,6 +92,40 @@ function UploadForm() {
     }
   };
 
+  // --- Follow the background job's event stream until its result is ready ---
+  const waitForJob = (jobId) => new Promise((resolve, reject) => {
+    const events = new EventSource(`http://localhost:5000/jobs/${jobId}/events`);
+    const readData = (e) => JSON.parse(e.data);
+    events.addEventListener("stage", (e) => setJobStage(readData(e).stage));
+    events.addEventListener("progress", (e) => {
+      const { stage, progress } = readData(e);
+      setJobStage(progress.total ? `${stage} ${progress.done}/${progress.total}` : stage);
+    });
+    events.addEventListener("segment", (e) => {
+      const segment = readData(e);
+      setTranscriptSegments((prev) => [...prev, segment]);
+    });
+    events.addEventListener("section", (e) => {
+      const { index, ...section } = readData(e);
+      setDocumentationSections((prev) => { const next = [...prev]; next[index] = section; return next; });
+    });
+    const settle = async () => {
+      events.close();
+      try {
+        const resultRes = await fetch(`http://localhost:5000/jobs/${jobId}/result`);
+        const result = await resultRes.json();
+        if (!resultRes.ok) throw new Error(result.error || "Server error");
+        if (resultRes.status === 202) throw new Error("Lost connection to the processing job");
+        resolve(result);
+      } catch (error) { reject(error); }
+    };
+    events.addEventListener("failed", (e) => { events.close(); reject(new Error(readData(e).error || "Processing failed")); });
+    events.addEventListener("done", settle);
+    // EventSource retries dropped connections by itself; it only closes for good on an error response (e.g. 404 once
+    // the job is gone after a restart or pruning), so ask the result endpoint what happened instead of waiting forever.
+    events.onerror = () => { if (events.readyState === EventSource.CLOSED) settle(); };
+  });
+
   const baseFilename = videoUrl ? videoTitle : 'video_analysis';
 
   return (
@@ -116,7 +157,7 @@ function UploadForm() {
         </form>
       </div>
 
-      {loading && <p className="loading-message">⏳ Processing... This may take a few minutes.</p>}
+      {loading && <p className="loading-message">⏳ Processing{jobStage ? ` (${jobStage})` : ""}... This may take a few minutes.</p>}
       {errorMessage && <p className="error-message">{errorMessage}</p>}
 
       {transcriptSegments.length > 0 && (
@@ -166,6 +207,7 @@ function UploadForm() {
       
       <ChatWidget 
         transcript={transcriptSegments.map(s => s.text).join(' ')}
+        indexId={indexId}
         setVideoUrl={setVideoUrl}
         handleFormSubmit={handleFormSubmit}
         refs={{ uploadFormRef, docsRef, faqRef }}
@@ -214,7 +256,7 @@ const CollapsibleSection = ({ items, type }) => {
   );
 };
 
-const ChatWidget = ({ transcript, setVideoUrl, handleFormSubmit, refs }) => {
+const ChatWidget = ({ transcript, indexId, setVideoUrl, handleFormSubmit, refs }) => {
   const [isOpen, setIsOpen] = useState(false);
   const [userQuestion, setUserQuestion] = useState("");
   const [chatHistory, setChatHistory] = useState([]);
@@ -282,11 +324,13 @@ const ChatWidget = ({ transcript, setVideoUrl, handleFormSubmit, refs }) => {
           }
           const askRes = await fetch("http://localhost:5000/ask", {
             method: "POST", headers: { 'Content-Type': 'application/json' },
-            body: JSON.stringify({ question: question, context: transcript }),
+            // With a server-side index only the question is sent; the backend retrieves the relevant excerpts.
+            body: JSON.stringify(indexId ? { question: question, index_id: indexId } : { question: question, context: transcript }),
           });
           const askData = await askRes.json();
           if (!askRes.ok) throw new Error(askData.error || "Bot error");
-          setChatHistory([...newHistory, { sender: 'bot', text: askData.answer }]);
+          const sources = (askData.citations || []).map(c => c.formatted_timestamp).join(', ');
+          setChatHistory([...newHistory, { sender: 'bot', text: sources ? `${askData.answer}\n\nSources: ${sources}` : askData.answer }]);
           break;
         
         default: